@@ -1,7 +1,44 @@
+from typing import Any, List
+
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.core.validators import FileExtensionValidator
 
 
 class TransactionFileForm(forms.Form):
     # TODO: Validate the csv file properly
     file = forms.FileField(validators=[FileExtensionValidator(allowed_extensions=["csv"])])
+
+
+class MultipleFileInput(forms.ClearableFileInput):
+    # Only Django 3.2.19 and later read this; before that the widget is made multiple below
+    allow_multiple_selected = True
+
+    def __init__(self, attrs: Any = None) -> None:
+        super().__init__({"multiple": True, **(attrs or {})})
+
+    def value_from_datadict(self, data: Any, files: Any, name: str) -> List[UploadedFile]:
+        return files.getlist(name)
+
+
+class MultipleFileField(forms.FileField):
+    widget = MultipleFileInput
+
+    def clean(self, data: Any, initial: Any = None) -> List[UploadedFile]:
+        files = data if isinstance(data, (list, tuple)) else [data]
+        # An empty list still has to fail on being required
+        return [super(MultipleFileField, self).clean(file, initial) for file in files or [None]]
+
+
+class TransactionFilesForm(forms.Form):
+    """CSV files of one or more accounts, or ZIP archives with them"""
+
+    file = MultipleFileField(
+        validators=[FileExtensionValidator(allowed_extensions=["csv", "zip"])]
+    )
+
+
+class ExportFilterForm(forms.Form):
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    account = forms.CharField(required=False, help_text="Account number of an own account")
@@ -0,0 +1,22 @@
+from typing import Any
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandParser
+
+from apps.transactions.utils.recurrences import refresh_recurrences
+
+
+class Command(BaseCommand):
+    help = "Detects the recurring payments in the whole history, imports only refresh new ones"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--user", help="Username of the only user to detect them for")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        users = get_user_model().objects.order_by("pk")
+        if options["user"] is not None:
+            users = users.filter(username=options["user"])
+
+        for user in users.iterator():
+            found = refresh_recurrences(user)
+            self.stdout.write(f"{user.username}: {len(found)} recurring payment(s)")
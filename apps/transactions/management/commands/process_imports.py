@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Set
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+
+from apps.transactions.models import ImportJob
+from apps.transactions.utils.importjobs import claim_next_job, requeue_stale_jobs, run_import_job
+
+
+class Command(BaseCommand):
+    help = "Imports uploaded transaction files in the background"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--workers", type=int, default=2, help="Jobs to run at once")
+        parser.add_argument(
+            "--interval", type=float, default=2.0, help="Seconds to wait when idle"
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Stop when there are no pending jobs left"
+        )
+        parser.add_argument(
+            "--requeue",
+            action="store_true",
+            help=(
+                "Put jobs that are still running but had no progress for IMPORT_STALE_AFTER "
+                "seconds (from a crashed worker) back in the queue"
+            ),
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+            # The web processes would never see the new data versions of the imported users
+            raise CommandError(
+                "The import worker needs a cache that is shared with the web processes, "
+                "set CACHE_URL to a database, file or Redis cache instead of locmemcache://"
+            )
+
+        if options["requeue"]:
+            self.stdout.write(f"Requeued {requeue_stale_jobs()} job(s)")
+
+        running: Set[Future] = set()
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            while True:
+                while len(running) < options["workers"] and (job := claim_next_job()):
+                    running.add(pool.submit(self.run, job))
+
+                if running:
+                    done, running = wait(
+                        running, timeout=options["interval"], return_when=FIRST_COMPLETED
+                    )
+                    for future in done:
+                        future.result()
+                elif options["once"]:
+                    return
+                else:
+                    time.sleep(options["interval"])
+
+    def run(self, job: ImportJob) -> None:
+        try:
+            job = run_import_job(job)
+            self.stdout.write(
+                f"Job {job.pk} {job.status}: {job.amount_success} new, "
+                f"{job.amount_duplicate} duplicate, {job.amount_failed} failed"
+            )
+        finally:
+            # Every thread has its own connection, which would otherwise stay open
+            connection.close()
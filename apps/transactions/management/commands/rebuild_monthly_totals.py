@@ -0,0 +1,21 @@
+from typing import Any
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandParser
+
+from apps.transactions.models import MonthlyTotal, Transaction
+
+
+class Command(BaseCommand):
+    help = "Recomputes the monthly totals from the transactions"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--user", help="Username of the only user to rebuild the totals of")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        user = None
+        if options["user"] is not None:
+            user = get_user_model().objects.get(username=options["user"])
+
+        amount = MonthlyTotal.objects.rebuild(Transaction.objects.all(), user=user)
+        self.stdout.write(f"Rebuilt {amount} monthly total(s)")
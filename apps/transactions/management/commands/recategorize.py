@@ -0,0 +1,25 @@
+from typing import Any
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandParser
+
+from apps.transactions.utils.categories import recategorize
+
+
+class Command(BaseCommand):
+    help = "Applies the current category rules to the existing transactions"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--user", help="Username of the only user to recategorize")
+        parser.add_argument(
+            "--chunk-size", type=int, default=2000, help="Transactions to load at once"
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        users = get_user_model().objects.order_by("pk")
+        if options["user"] is not None:
+            users = users.filter(username=options["user"])
+
+        for user in users.iterator():
+            changed = recategorize(user, chunk_size=options["chunk_size"])
+            self.stdout.write(f"{user.username}: {changed} transaction(s) got another category")
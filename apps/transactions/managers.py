@@ -1,12 +1,16 @@
 from datetime import date
 from decimal import Decimal
 from enum import Enum
-from typing import Dict, Any, TYPE_CHECKING
+from io import StringIO
+from itertools import islice
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple, TYPE_CHECKING
 
 from apps.accounts.models import User as UserType
+from dateutil.relativedelta import relativedelta
 from django.contrib.auth import get_user_model
-from django.db import models
-from django.db.models import Q, Sum
+from django.db import connections, models, transaction as db_transaction
+from django.db.models import Count, F, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, TruncMonth
 from django.db.models.query import QuerySet
 
 from apps.transactions.utils.date import get_start_end_date_from
@@ -21,7 +25,330 @@ class ParseResult(Enum):
     DUPLICATE = 2
     ERROR = 3
 
+
+# The text search configuration of the memo index, the exports are in Dutch
+SEARCH_CONFIG = "dutch"
+
+
+class TransactionQuerySet(models.QuerySet[Any]):
+    def delete(self) -> Tuple[int, Dict[str, int]]:
+        """Takes the transactions off the monthly totals, with one update per total, forgets
+        the imported sequences of their accounts and deletes them with one query. A signal per
+        transaction would load and delete them one by one, also when they are deleted along
+        with their account."""
+        from apps.transactions.models import MonthlyTotal, SequenceWatermark
+        from apps.transactions.utils.cache import bump_data_version
+
+        with db_transaction.atomic(using=self.db):
+            user_ids = MonthlyTotal.objects.subtract(self)
+            SequenceWatermark.objects.forget(self)
+            deleted = super().delete()
+        for user_id in user_ids:
+            bump_data_version(user_id)
+        return deleted
+
+
+class TransactionManager(models.Manager[Any]):
+    def get_queryset(self) -> QuerySet[Any]:
+        return TransactionQuerySet(self.model, using=self._db)
+
+    def search(self, user: UserType, query: str) -> QuerySet[Any]:
+        """The transactions whose memo contains the words of the query, or whose counterparty
+        has a name like it, best matches first.
+
+        On PostgreSQL the memo is matched with the full-text index and the name with the
+        trigram index, see `MEMO_SEARCH_INDEXES`. Other databases get `icontains`, which scans.
+        """
+        transactions = self.filter(user=user).select_related("other_party")
+        if connections[self.db].vendor != "postgresql":
+            return transactions.filter(
+                Q(memo__icontains=query) | Q(other_party__name__icontains=query)
+            ).order_by("-date", "-pk")
+
+        from django.contrib.postgres.search import (
+            SearchQuery,
+            SearchRank,
+            SearchVector,
+            TrigramSimilarity,
+        )
+
+        vector = SearchVector("memo", config=SEARCH_CONFIG)
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+        accounts = self.model._meta.get_field("other_party").related_model.objects
+        return (
+            transactions.annotate(
+                document=vector,
+                rank=Greatest(
+                    SearchRank(vector, search_query),
+                    TrigramSimilarity("other_party__name", query),
+                ),
+            )
+            .filter(
+                Q(document=search_query)
+                | Q(other_party__in=accounts.filter(name__trigram_similar=query))
+            )
+            .order_by("-rank", "-date", "-pk")
+        )
+
+    def insert_new(self, transactions: List[Any], batch_size: int = 1000) -> List[Any]:
+        """Inserts the transactions whose code is not in the database yet, a batch per statement.
+        `ON CONFLICT DO NOTHING` makes this safe against concurrent imports of the same codes.
+
+        Returns:
+            The inserted transactions, with their primary keys set
+        """
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        meta = self.model._meta
+        fields = [f for f in meta.concrete_fields if not f.primary_key]
+        batch_size = min(batch_size, connection.ops.bulk_batch_size(fields, transactions))
+        row = f"({', '.join(['%s'] * len(fields))})"
+        code = quote(meta.get_field("code").column)
+        sql = (
+            f"INSERT INTO {quote(meta.db_table)} ({', '.join(quote(f.column) for f in fields)}) "
+            "VALUES {rows} "
+            f"ON CONFLICT ({code}) DO NOTHING RETURNING {quote(meta.pk.column)}, {code}"
+        )
+
+        inserted = []
+        iterator = iter(transactions)
+        while batch := list(islice(iterator, batch_size)):
+            params = [
+                f.get_db_prep_save(get_value_of(transaction, f), connection)
+                for transaction in batch
+                for f in fields
+            ]
+            with connection.cursor() as cursor:
+                cursor.execute(sql.format(rows=", ".join([row] * len(batch))), params)
+                ids_by_code = {code: pk for pk, code in cursor.fetchall()}
+
+            for transaction in batch:
+                if transaction.code in ids_by_code:
+                    transaction.pk = ids_by_code[transaction.code]
+                    transaction._state.adding = False
+                    inserted.append(transaction)
+
+        return inserted
+
+    def copy_new(self, transactions: List[Any], batch_size: int = 10000) -> List[Any]:
+        """Like `insert_new`, but streams the rows into a staging table with `COPY` first and
+        merges them with a single `INSERT ... SELECT` per batch. Postgres only; other databases
+        get `insert_new`.
+        """
+        connection = connections[self.db]
+        if connection.vendor != "postgresql":
+            return self.insert_new(transactions, batch_size)
+
+        quote = connection.ops.quote_name
+        meta = self.model._meta
+        fields = [f for f in meta.concrete_fields if not f.primary_key]
+        table = quote(meta.db_table)
+        staging = quote(f"{meta.db_table}_staging")
+        columns = ", ".join(quote(f.column) for f in fields)
+        code = quote(meta.get_field("code").column)
+
+        inserted = []
+        iterator = iter(transactions)
+        with db_transaction.atomic(using=self.db), connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging} ON COMMIT DROP AS "
+                f"SELECT {columns} FROM {table} WITH NO DATA"
+            )
+            while batch := list(islice(iterator, batch_size)):
+                rows = StringIO()
+                for transaction in batch:
+                    values = (
+                        f.get_db_prep_save(get_value_of(transaction, f), connection)
+                        for f in fields
+                    )
+                    rows.write("\t".join(to_copy_text(value) for value in values))
+                    rows.write("\n")
+                rows.seek(0)
+
+                cursor.execute(f"TRUNCATE {staging}")
+                cursor.copy_expert(f"COPY {staging} ({columns}) FROM STDIN", rows)
+                cursor.execute(
+                    f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+                    f"ON CONFLICT ({code}) DO NOTHING RETURNING {quote(meta.pk.column)}, {code}"
+                )
+                ids_by_code = {code: pk for pk, code in cursor.fetchall()}
+
+                for transaction in batch:
+                    if transaction.code in ids_by_code:
+                        transaction.pk = ids_by_code[transaction.code]
+                        transaction._state.adding = False
+                        inserted.append(transaction)
+
+        return inserted
+
+
+def get_value_of(instance: Any, field: Any) -> Any:
+    value = getattr(instance, field.attname)
+    if value is None and field.is_relation and field.is_cached(instance):
+        # The related account was saved after it was assigned
+        value = field.get_cached_value(instance).pk
+    return value
+
+
+def to_copy_text(value: Any) -> str:
+    """A value in the text format of `COPY`"""
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class MonthlyTotalManager(models.Manager[Any]):
+    # The migration that adds the totals rebuilds them from the existing transactions
+    use_in_migrations = True
+
+    KEY = ("user", "receiver", "other_party", "month")
+    SUMS = ("incomes", "expenses", "income_count", "expense_count")
+
+    def add(self, transactions: Iterable[Any], batch_size: int = 1000) -> None:
+        """Adds the transactions to the totals of their month.
+        The totals are summed up in memory first and upserted with one statement per batch,
+        `ON CONFLICT DO UPDATE` adds them to the totals that exist already."""
+        totals = self.__sum_up(transactions)
+        if not totals:
+            return
+
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        meta = self.model._meta
+        table = quote(meta.db_table)
+        fields = [meta.get_field(name) for name in self.KEY + self.SUMS]
+        key = ", ".join(quote(meta.get_field(name).column) for name in self.KEY)
+        sums = [quote(meta.get_field(name).column) for name in self.SUMS]
+        batch_size = min(batch_size, connection.ops.bulk_batch_size(fields, list(totals)))
+        row = f"({', '.join(['%s'] * len(fields))})"
+        sql = (
+            f"INSERT INTO {table} ({', '.join(quote(f.column) for f in fields)}) "
+            "VALUES {rows} "
+            f"ON CONFLICT ({key}) DO UPDATE SET "
+            + ", ".join(f"{column} = {table}.{column} + EXCLUDED.{column}" for column in sums)
+        )
+
+        iterator = iter(totals.items())
+        with connection.cursor() as cursor:
+            while batch := list(islice(iterator, batch_size)):
+                params = [
+                    f.get_db_prep_save(value, connection)
+                    for key_values, sum_values in batch
+                    for f, value in zip(fields, key_values + tuple(sum_values))
+                ]
+                cursor.execute(sql.format(rows=", ".join([row] * len(batch))), params)
+
+    def subtract(self, transactions: QuerySet[Any]) -> Set[int]:
+        """Takes transactions that are about to be deleted off the totals, summed up per total
+        by the database.
+
+        Returns:
+            The users whose totals changed
+        """
+        user_ids = set()
+        for total in self.__sum_up_in_database(transactions):
+            user_ids.add(total["user"])
+            self.filter(**{name: total[name] for name in self.KEY}).update(
+                incomes=F("incomes") - (total["incomes"] or Decimal(0)),
+                expenses=F("expenses") - (total["expenses"] or Decimal(0)),
+                income_count=F("income_count") - total["income_count"],
+                expense_count=F("expense_count") - total["expense_count"],
+            )
+        return user_ids
+
+    def rebuild(self, transactions: QuerySet[Any], user: Optional[UserType] = None) -> int:
+        """Replaces the totals (of a user) by the sums of the transactions
+
+        Returns:
+            The amount of totals
+        """
+        totals = self.all()
+        if user is not None:
+            totals = totals.filter(user=user)
+            transactions = transactions.filter(user=user)
+
+        rebuilt = [
+            self.model(
+                user_id=total["user"],
+                receiver_id=total["receiver"],
+                other_party_id=total["other_party"],
+                month=total["month"],
+                incomes=total["incomes"] or Decimal(0),
+                expenses=total["expenses"] or Decimal(0),
+                income_count=total["income_count"],
+                expense_count=total["expense_count"],
+            )
+            for total in self.__sum_up_in_database(transactions)
+        ]
+        with db_transaction.atomic(using=self.db):
+            totals.delete()
+            self.bulk_create(rebuilt, batch_size=1000)
+        return len(rebuilt)
+
+    def __sum_up_in_database(self, transactions: QuerySet[Any]) -> Iterator[Dict[str, Any]]:
+        return (
+            transactions.annotate(month=TruncMonth("date"))
+            .values(*self.KEY)
+            .annotate(
+                incomes=Sum("amount", filter=Q(amount__gt=0)),
+                expenses=Sum("amount", filter=Q(amount__lt=0)),
+                income_count=Count("pk", filter=Q(amount__gt=0)),
+                expense_count=Count("pk", filter=Q(amount__lt=0)),
+            )
+            .order_by()
+            .iterator()
+        )
+
+    def __sum_up(self, transactions: Iterable[Any]) -> Dict[Tuple[Any, ...], List[Any]]:
+        totals: Dict[Tuple[Any, ...], List[Any]] = {}
+        for transaction in transactions:
+            meta = transaction._meta
+            key = tuple(
+                get_value_of(transaction, meta.get_field(name)) for name in self.KEY[:-1]
+            ) + (transaction.date.replace(day=1),)
+            sums = totals.setdefault(key, [Decimal(0), Decimal(0), 0, 0])
+            if transaction.amount > 0:
+                sums[0] += transaction.amount
+                sums[2] += 1
+            elif transaction.amount < 0:
+                sums[1] += transaction.amount
+                sums[3] += 1
+        return totals
+
+
+class SequenceWatermarkManager(models.Manager[Any]):
+    def forget(self, transactions: QuerySet[Any]) -> int:
+        """Drops the watermarks of the own accounts of transactions that are about to be
+        deleted. Otherwise importing the same export again would skip them as imported.
+
+        Returns:
+            The amount of dropped watermarks
+        """
+        receivers = (
+            transactions.values_list("user", "receiver__account_number_key").distinct().order_by()
+        )
+        condition = Q()
+        for user_id, account_number_key in receivers:
+            condition |= Q(user=user_id, account_number=account_number_key)
+        if not condition:
+            return 0
+        return self.filter(condition).delete()[0]
+
+
+# The columns the lists of transactions show
+LISTED_FIELDS = ("date", "amount", "other_party__name")
+
+
 class StatisticsManager(models.Manager[Any]):
+    def get_queryset(self) -> QuerySet[Any]:
+        return TransactionQuerySet(self.model, using=self._db)
+
     def get_user_queryset(self, user: UserType) -> QuerySet[Any]:
         return super().get_queryset().filter(user=user)
 
@@ -36,6 +363,8 @@ class StatisticsManager(models.Manager[Any]):
         return (
             self.get_queryset_external_transactions(month, user)
             .filter(amount__lt=0)
+            .select_related("other_party")
+            .only(*LISTED_FIELDS)
             .order_by("amount")[:5]
         )
 
@@ -49,13 +378,100 @@ class StatisticsManager(models.Manager[Any]):
                 date__gte=dates[0],
                 date__lte=dates[1],
             )
+            .select_related("other_party")
+            .only(*LISTED_FIELDS)
             .order_by("-amount")[:5]
         )
 
     def get_external_totals(self, month: date, user: UserType) -> Dict[str, Decimal]:
-        dates = get_start_end_date_from(month)
-        expenses = Sum("amount", filter=Q(amount__lt=0))
-        incomes = Sum("amount", filter=Q(amount__gt=0))
-        return self.get_queryset_external_transactions(month, user).aggregate(
-            expenses=expenses, incomes=incomes
-        )
\ No newline at end of file
+        return self.get_monthly_totals(month, user).aggregate(
+            expenses=Sum("expenses"), incomes=Sum("incomes")
+        )
+
+    def get_monthly_totals(self, month: date, user: UserType) -> QuerySet[Any]:
+        """The rolled up totals of the external transactions of a month"""
+        return self.get_external_rollup(user).filter(month=get_start_end_date_from(month)[0])
+
+    def get_external_rollup(self, user: UserType) -> QuerySet[Any]:
+        from apps.transactions.models import MonthlyTotal
+
+        return MonthlyTotal.objects.filter(user=user, other_party__is_user_owner=False)
+
+    def get_monthly_series(self, start: date, end: date, user: UserType) -> List[Dict[str, Any]]:
+        """The external incomes and expenses of every month from the month of `start` up to
+        and including the month of `end`, also of the months without transactions.
+        One query, grouped by the month the rollup is truncated to already."""
+        first = get_start_end_date_from(start)[0]
+        last = get_start_end_date_from(end)[0]
+        sums = {
+            row["month"]: row
+            for row in self.get_external_rollup(user)
+            .filter(month__gte=first, month__lte=last)
+            .values("month")
+            .annotate(incomes=Sum("incomes"), expenses=Sum("expenses"))
+            .order_by("month")
+        }
+
+        series = []
+        month = first
+        while month <= last:
+            row = sums.get(month, {})
+            series.append(
+                {
+                    "month": month,
+                    "incomes": row.get("incomes") or Decimal(0),
+                    "expenses": row.get("expenses") or Decimal(0),
+                }
+            )
+            month += relativedelta(months=1)
+        return series
+
+    def get_counterparty_totals(self, start: date, end: date, user: UserType) -> QuerySet[Any]:
+        """The external incomes and expenses per counterparty between two dates (inclusive),
+        the largest expenses first"""
+        zero = Value(Decimal(0), output_field=models.DecimalField())
+        return (
+            self.get_user_queryset(user)
+            .filter(other_party__is_user_owner=False, date__gte=start, date__lte=end)
+            .values("other_party", "other_party__name")
+            .annotate(
+                incomes=Coalesce(Sum("amount", filter=Q(amount__gt=0)), zero),
+                expenses=Coalesce(Sum("amount", filter=Q(amount__lt=0)), zero),
+                count=Count("pk"),
+            )
+            .order_by("expenses", "-incomes", "other_party")
+        )
+
+    def get_dashboard(self, month: date, user: UserType) -> Dict[str, Any]:
+        """The external totals and the top 5 expenses and incomes of a month, in one query.
+        The transactions are those of the top 5 subqueries, the totals come from the rollup."""
+        totals = self.get_monthly_totals(month, user).values("user")
+        top = (
+            self.get_queryset_external_transactions(month, user)
+            .filter(
+                Q(pk__in=self.top_expenses(month, user).values("pk"))
+                | Q(pk__in=self.top_incomes(month, user).values("pk"))
+            )
+            .select_related("other_party")
+            .only(*LISTED_FIELDS)
+            .annotate(
+                total_expenses=Subquery(totals.annotate(total=Sum("expenses")).values("total")),
+                total_incomes=Subquery(totals.annotate(total=Sum("incomes")).values("total")),
+            )
+            .order_by("amount")
+        )
+
+        dashboard: Dict[str, Any] = {
+            "expenses": None,
+            "incomes": None,
+            "top_expenses": [],
+            "top_incomes": [],
+        }
+        for transaction in top:
+            dashboard["expenses"] = transaction.total_expenses
+            dashboard["incomes"] = transaction.total_incomes
+            if transaction.amount < 0:
+                dashboard["top_expenses"].append(transaction)
+            else:
+                dashboard["top_incomes"].insert(0, transaction)
+        return dashboard
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0005_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='identical_to',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='transactions.importjob'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='row_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='importjob',
+            index=models.Index(fields=['user', 'fingerprint'], name='importjob_fingerprint_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('transactions', '0006_importjob_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenceWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_number', models.CharField(max_length=36)),
+                ('low', models.BigIntegerField()),
+                ('high', models.BigIntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='sequencewatermark',
+            constraint=models.UniqueConstraint(fields=('user', 'account_number'), name='unique_sequence_watermark'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:23
+
+import apps.transactions.managers
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def rebuild_monthly_totals(apps, schema_editor):
+    MonthlyTotal = apps.get_model('transactions', 'MonthlyTotal')
+    Transaction = apps.get_model('transactions', 'Transaction')
+    MonthlyTotal.objects.rebuild(Transaction.objects.all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('transactions', '0008_statistics_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('incomes', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('expenses', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('income_count', models.IntegerField(default=0)),
+                ('expense_count', models.IntegerField(default=0)),
+                ('other_party', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_totals', to='transactions.account')),
+                ('receiver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='transactions.account')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            managers=[
+                ('objects', apps.transactions.managers.MonthlyTotalManager()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='monthlytotal',
+            constraint=models.UniqueConstraint(fields=('user', 'receiver', 'other_party', 'month'), name='unique_monthly_total'),
+        ),
+        migrations.RunPython(rebuild_monthly_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+from django.db import connection, migrations
+
+
+def search_index_operations():
+    """The full-text index of the memo and the trigram index of the counterparty name, only on
+    PostgreSQL like `MEMO_SEARCH_INDEXES` and `NAME_TRIGRAM_INDEXES` of the models"""
+    if connection.vendor != 'postgresql':
+        return []
+
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.operations import TrigramExtension
+    from django.contrib.postgres.search import SearchVector
+
+    return [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=GinIndex(SearchVector('memo', config='dutch'), name='transaction_memo_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='account',
+            index=GinIndex(fields=['name'], name='account_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0009_monthlytotal'),
+    ]
+
+    operations = search_index_operations()
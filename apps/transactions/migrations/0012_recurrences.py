@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('transactions', '0011_categories'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.IntegerField(choices=[(7, 'Weekly'), (30, 'Monthly'), (91, 'Quarterly'), (365, 'Yearly')])),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('occurrences', models.PositiveIntegerField()),
+                ('first_date', models.DateField()),
+                ('last_date', models.DateField()),
+                ('next_date', models.DateField()),
+                ('other_party', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurrences', to='transactions.account')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='recurrence',
+            constraint=models.UniqueConstraint(fields=('user', 'other_party'), name='unique_recurrence'),
+        ),
+    ]
@@ -0,0 +1,158 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:05
+
+import numpy as np
+from django.db import migrations, models
+
+from apps.transactions.utils.recurrences import PERIOD_STEPS, find_recurrences
+
+
+# Copies of the functions in `models`, which may change after this migration
+def account_number_key_of(account_number):
+    return ''.join(account_number.split()).upper()
+
+
+def name_key_of(name):
+    return ' '.join(name.split()).casefold()
+
+
+def unique_key_of(account):
+    return account.user_id, account.account_number_key, '' if account.account_number_key else account.name_key
+
+
+def detect_recurrences(Transaction, Recurrence, user_id):
+    """Like `refresh_recurrences`, with the models of this migration"""
+    rows = list(
+        Transaction.objects.filter(user=user_id, other_party__is_user_owner=False, amount__lt=0)
+        .order_by('other_party', 'date')
+        .values_list('other_party', 'date', 'amount')
+    )
+    found = find_recurrences(
+        np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+        np.fromiter((row[1].toordinal() for row in rows), dtype=np.int64, count=len(rows)),
+        np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows)),
+    )
+    Recurrence.objects.bulk_create(
+        Recurrence(user_id=user_id, next_date=recurrence['last_date'] + PERIOD_STEPS[recurrence['period']], **recurrence)
+        for recurrence in found
+    )
+
+
+def set_keys_and_merge_accounts(apps, schema_editor):
+    """Fills the lookup keys, after which accounts of a user with the same key are merged into
+    the oldest one. Counterparties used to be shared between users, those get a copy per user.
+    The monthly totals and recurrences of the users whose accounts were merged are rebuilt."""
+    Account = apps.get_model('transactions', 'Account')
+    Transaction = apps.get_model('transactions', 'Transaction')
+    MonthlyTotal = apps.get_model('transactions', 'MonthlyTotal')
+    Recurrence = apps.get_model('transactions', 'Recurrence')
+
+    accounts = list(Account.objects.order_by('pk'))
+    for account in accounts:
+        account.account_number_key = account_number_key_of(account.account_number)
+        account.name_key = name_key_of(account.name)
+    Account.objects.bulk_update(accounts, ['account_number_key', 'name_key'], batch_size=1000)
+
+    kept = {}
+    for account in accounts:
+        kept.setdefault(unique_key_of(account), account)
+    by_pk = {account.pk: account for account in accounts}
+
+    affected_users = set()
+    for field in ('receiver', 'other_party'):
+        pairs = list(Transaction.objects.values_list('user', field).distinct().order_by('user', field))
+        for user_id, account_id in pairs:
+            account = by_pk[account_id]
+            key = (user_id,) + unique_key_of(account)[1:]
+            keeper = kept.get(key)
+            if keeper is None:
+                keeper = Account.objects.create(
+                    user_id=user_id,
+                    name=account.name,
+                    account_number=account.account_number,
+                    account_number_key=account.account_number_key,
+                    name_key=account.name_key,
+                    is_user_owner=False,
+                )
+                kept[key] = by_pk[keeper.pk] = keeper
+            if keeper.pk == account_id:
+                continue
+
+            Transaction.objects.filter(user_id=user_id, **{field: account_id}).update(**{field: keeper})
+            if field == 'receiver' and not keeper.is_user_owner:
+                keeper.is_user_owner = True
+                keeper.save(update_fields=['is_user_owner'])
+            affected_users.add(user_id)
+
+    merged = [account.pk for account in accounts if kept[unique_key_of(account)] is not account]
+    owners = Account.objects.filter(pk__in=merged, is_user_owner=True)
+    for account in owners:
+        Account.objects.filter(pk=kept[unique_key_of(account)].pk).update(is_user_owner=True)
+    Recurrence.objects.filter(user__in=affected_users).delete()
+    Account.objects.filter(pk__in=merged).delete()
+    for user_id in sorted(affected_users):
+        MonthlyTotal.objects.rebuild(Transaction.objects.all(), user=user_id)
+        detect_recurrences(Transaction, Recurrence, user_id)
+
+
+def set_watermark_keys(apps, schema_editor):
+    """The watermarks are looked up by the account number key as well. Two watermarks of the
+    same account are merged like `SequenceRange.merge` does."""
+    SequenceWatermark = apps.get_model('transactions', 'SequenceWatermark')
+
+    kept = {}
+    for mark in SequenceWatermark.objects.order_by('pk'):
+        key = (mark.user_id, account_number_key_of(mark.account_number))
+        other = kept.get(key)
+        if other is None:
+            kept[key] = mark
+            if mark.account_number != key[1]:
+                mark.account_number = key[1]
+                mark.save(update_fields=['account_number'])
+            continue
+
+        if mark.low <= other.high + 1 and other.low <= mark.high + 1:
+            other.low, other.high = min(other.low, mark.low), max(other.high, mark.high)
+        elif mark.high > other.high:
+            other.low, other.high = mark.low, mark.high
+        mark.delete()
+        other.save(update_fields=['low', 'high'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0012_recurrences'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='account_number_key',
+            field=models.CharField(default='', editable=False, max_length=36),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='name_key',
+            field=models.CharField(default='', editable=False, max_length=70),
+            preserve_default=False,
+        ),
+        migrations.RemoveConstraint(
+            model_name='account',
+            name='unique_account_number',
+        ),
+        migrations.RunPython(set_keys_and_merge_accounts, migrations.RunPython.noop),
+        migrations.RunPython(set_watermark_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='account',
+            constraint=models.UniqueConstraint(condition=models.Q(('account_number_key', ''), _negated=True), fields=('user', 'account_number_key'), name='unique_account_number_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='account',
+            constraint=models.UniqueConstraint(condition=models.Q(('account_number_key', '')), fields=('user', 'name_key'), name='unique_account_name_key'),
+        ),
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['user', 'name_key'], name='account_user_name_key_idx'),
+        ),
+    ]
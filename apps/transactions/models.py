@@ -1,23 +1,111 @@
+from typing import Any, Dict, List, Optional, Tuple
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import connection, models
 
-from apps.transactions.managers import StatisticsManager
+from apps.transactions.managers import (
+    SEARCH_CONFIG,
+    MonthlyTotalManager,
+    SequenceWatermarkManager,
+    StatisticsManager,
+    TransactionManager,
+)
 
 User = get_user_model()
 
+# The indexes of `TransactionManager.search`. Only PostgreSQL has them, like it only has
+# `django.contrib.postgres` installed; other databases search with a scan.
+MEMO_SEARCH_INDEXES: List[models.Index] = []
+NAME_TRIGRAM_INDEXES: List[models.Index] = []
+if connection.vendor == 'postgresql':
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    # The expression is the one the search filters on
+    MEMO_SEARCH_INDEXES.append(
+        GinIndex(SearchVector('memo', config=SEARCH_CONFIG), name='transaction_memo_search_idx')
+    )
+    NAME_TRIGRAM_INDEXES.append(
+        GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='account_name_trgm_idx')
+    )
+
+
+def account_number_key_of(account_number: str) -> str:
+    """Banks print the same IBAN with or without spaces and in either case"""
+    return ''.join(account_number.split()).upper()
+
+
+def name_key_of(name: str) -> str:
+    """Names of counterparties differ in case and spacing between exports"""
+    return ' '.join(name.split()).casefold()
+
 
 class Account(models.Model):
     name = models.CharField(max_length=70)
     account_number = models.CharField(max_length=36)
     is_user_owner = models.BooleanField()
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # The accounts of a user are looked up by these, see `set_keys`
+    account_number_key = models.CharField(max_length=36, editable=False)
+    name_key = models.CharField(max_length=70, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'account_number_key'],
+                condition=~models.Q(account_number_key=''),
+                name='unique_account_number_key',
+            ),
+            # Counterparties without an account number are known by their name only
+            models.UniqueConstraint(
+                fields=['user', 'name_key'],
+                condition=models.Q(account_number_key=''),
+                name='unique_account_name_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'name_key'], name='account_user_name_key_idx'),
+            *NAME_TRIGRAM_INDEXES,
+        ]
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        self.set_keys()
+        super().save(*args, **kwargs)
+
+    def set_keys(self) -> None:
+        """Sets the lookup keys, which `bulk_create` does not do by itself"""
+        self.account_number_key = account_number_key_of(self.account_number)
+        self.name_key = name_key_of(self.name)
+
+
+class Category(models.Model):
+    name = models.CharField(max_length=70)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
 
     class Meta:
-        constraints = [models.UniqueConstraint(fields=['account_number'], name='unique_account_number')]
+        constraints = [models.UniqueConstraint(fields=['user', 'name'], name='unique_category_name')]
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class Rule(models.Model):
+    """Puts the transactions of a user in a category when a field contains the pattern,
+    or, for account numbers, equals it. See `apps.transactions.utils.categories`."""
+
+    class Field(models.TextChoices):
+        OTHER_PARTY_NAME = 'other_party_name'
+        OTHER_PARTY_ACCOUNT_NUMBER = 'other_party_account_number'
+        MEMO = 'memo'
+
+    field = models.CharField(max_length=30, choices=Field.choices)
+    pattern = models.CharField(max_length=140)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='rules')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
 
 
 class Transaction(models.Model):
-    objects = models.Manager()
+    objects = TransactionManager()
     statistics = StatisticsManager()
 
     date = models.DateField()
@@ -29,6 +117,127 @@ class Transaction(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     receiver = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='transactions_received')
     other_party = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='transactions_sent')
+    category = models.ForeignKey(Category, null=True, blank=True, on_delete=models.SET_NULL)
 
     class Meta:
         constraints = [models.UniqueConstraint(fields=['code'], name='unique_transaction_code')]
+        indexes = [
+            # The transactions of a month newest first, and the seeks of its pages
+            models.Index(fields=['user', '-date', '-id'], name='transaction_user_date_id_idx'),
+            # The statistics of a month, `include` makes it covering on PostgreSQL
+            models.Index(
+                fields=['user', 'date', 'amount'],
+                include=['other_party'],
+                name='transaction_user_amount_idx',
+            ),
+            *MEMO_SEARCH_INDEXES,
+        ]
+
+    def delete(
+        self, using: Optional[str] = None, keep_parents: bool = False
+    ) -> Tuple[int, Dict[str, int]]:
+        """Deleted through the queryset, which takes it off the monthly totals.
+        A transaction has no parents to keep."""
+        deleted = Transaction.objects.using(using or self._state.db).filter(pk=self.pk).delete()
+        self.pk = None
+        return deleted
+
+
+class MonthlyTotal(models.Model):
+    """The transactions of a month between an own account and a counterparty, summed up.
+    Kept up to date by the importer, the signal of saved transactions and the deletes of
+    `TransactionQuerySet`"""
+
+    objects = MonthlyTotalManager()
+
+    month = models.DateField()
+    incomes = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    expenses = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    income_count = models.IntegerField(default=0)
+    expense_count = models.IntegerField(default=0)
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    receiver = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='+')
+    other_party = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='monthly_totals')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'receiver', 'other_party', 'month'], name='unique_monthly_total'
+            )
+        ]
+
+
+class SequenceWatermark(models.Model):
+    """The range of `Volgnr` sequences of an own account that is imported completely"""
+
+    objects = SequenceWatermarkManager()
+
+    # The account number key of the account, see `account_number_key_of`
+    account_number = models.CharField(max_length=36)
+    low = models.BigIntegerField()
+    high = models.BigIntegerField()
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "account_number"], name="unique_sequence_watermark"
+            )
+        ]
+
+
+class Recurrence(models.Model):
+    """Payments to a counterparty that come back at a regular interval with a stable amount,
+    like subscriptions and fixed charges. See `apps.transactions.utils.recurrences`."""
+
+    class Period(models.IntegerChoices):
+        WEEKLY = 7
+        MONTHLY = 30
+        QUARTERLY = 91
+        YEARLY = 365
+
+    period = models.IntegerField(choices=Period.choices)
+    amount = models.DecimalField(max_digits=8, decimal_places=2)
+    occurrences = models.PositiveIntegerField()
+    first_date = models.DateField()
+    last_date = models.DateField()
+    next_date = models.DateField()
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    other_party = models.ForeignKey(Account, on_delete=models.CASCADE, related_name="recurrences")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "other_party"], name="unique_recurrence")
+        ]
+
+
+class ImportJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    file = models.FileField(upload_to="imports/")
+    fingerprint = models.CharField(max_length=64, blank=True)
+    row_count = models.PositiveIntegerField(default=0)
+    identical_to = models.ForeignKey("self", null=True, on_delete=models.SET_NULL)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    amount_processed = models.PositiveIntegerField(default=0)
+    amount_success = models.PositiveIntegerField(default=0)
+    amount_duplicate = models.PositiveIntegerField(default=0)
+    amount_failed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    # Set by the worker after every batch, a running job without one for long is stale
+    heartbeat_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "fingerprint"], name="importjob_fingerprint_idx")]
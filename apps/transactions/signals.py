@@ -0,0 +1,32 @@
+from typing import Any
+
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Account, MonthlyTotal, SequenceWatermark, Transaction
+from .utils.cache import bump_data_version
+
+
+@receiver(post_save, sender=Transaction)
+def add_to_monthly_total(
+    sender: Any, instance: Transaction, created: bool, raw: bool, **kwargs: Any
+) -> None:
+    # Transactions are never edited, `manage.py rebuild_monthly_totals` repairs the totals if they are
+    if created and not raw:
+        MonthlyTotal.objects.add([instance])
+    bump_data_version(instance.user_id)
+
+
+@receiver(pre_delete, sender=Account)
+def forget_imported_sequences(sender: Any, instance: Account, **kwargs: Any) -> None:
+    # Its transactions are deleted along with it, without going through `TransactionQuerySet`
+    SequenceWatermark.objects.forget(
+        Transaction.objects.filter(Q(receiver=instance) | Q(other_party=instance))
+    )
+
+
+@receiver(post_delete, sender=Account)
+def bump_data_version_of_owner(sender: Any, instance: Account, **kwargs: Any) -> None:
+    # Its transactions and totals are deleted along with it, without signals
+    bump_data_version(instance.user_id)
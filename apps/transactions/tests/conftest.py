@@ -0,0 +1,15 @@
+from typing import Any
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def file_cache(settings: Any, tmp_path: Any) -> None:
+    """A file cache is shared between processes like the database cache, without adding queries.
+    Primary keys are reused between tests, so every test gets an empty one."""
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(tmp_path / "cache"),
+        }
+    }
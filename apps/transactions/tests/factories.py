@@ -3,7 +3,7 @@ from random import randint
 import factory.django
 from django.contrib.auth import get_user_model
 
-from apps.transactions.models import Account, Transaction
+from apps.transactions.models import Account, Category, Rule, Transaction
 
 
 class UserFactory(factory.django.DjangoModelFactory):
@@ -48,3 +48,22 @@ class TransactionFactory(factory.django.DjangoModelFactory):
     code = factory.LazyAttribute(lambda t: f'{t.receiver.account_number}{str(randint(1000, 999999))}')
     amount = Decimal(f'{str(randint(1, 9999))}.{str(randint(0, 99))}')
     memo = factory.Faker('sentence', nb_words=20),
+
+
+class CategoryFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Category
+        django_get_or_create = ('user', 'name')
+
+    name = factory.faker.Faker('word')
+    user = factory.SubFactory(UserFactory)
+
+
+class RuleFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Rule
+
+    field = Rule.Field.MEMO
+    pattern = factory.faker.Faker('word')
+    user = factory.SubFactory(UserFactory)
+    category = factory.SubFactory(CategoryFactory, user=factory.SelfAttribute('..user'))
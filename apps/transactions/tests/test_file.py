@@ -0,0 +1,81 @@
+import io
+import zipfile
+
+import pytest
+
+from apps.transactions.tests.utils import generate_test_file, open_test_file
+from apps.transactions.utils.file import (
+    MissingColumnsError,
+    RawTransaction,
+    fingerprint_of,
+    read_archive_rows_from,
+    read_raw_transaction_data_from,
+)
+
+
+def test_reads_only_needed_columns() -> None:
+    rows = list(read_raw_transaction_data_from(open_test_file("single_dummy.csv")))
+
+    assert rows == [
+        RawTransaction(
+            account_number="NL11RABO0104955555",
+            sequence="000000000000007213",
+            date="2019-09-01",
+            amount="+2,50",
+            currency="EUR",
+            other_party_account_number="NL42RABO0114164838",
+            other_party_name="J.M.G. Kerkhoffs eo",
+            description_1="Spotify",
+            description_2="1",
+            description_3="2",
+        )
+    ]
+
+
+def test_reads_columns_in_any_order() -> None:
+    file = io.StringIO(
+        "Omschrijving-3,Omschrijving-2,Omschrijving-1,Naam tegenpartij,Tegenrekening IBAN/BBAN,"
+        "Munt,Bedrag,Datum,Volgnr,IBAN/BBAN\n"
+        "c,b,a,Hema,NL01,EUR,-1,2021-01-01,1,NL02\n"
+    )
+
+    row = next(read_raw_transaction_data_from(file))
+
+    assert row.account_number == "NL02"
+    assert row.other_party_name == "Hema"
+    assert row.description_1 == "a"
+
+
+def test_fails_fast_when_headers_are_missing() -> None:
+    with pytest.raises(MissingColumnsError) as error:
+        read_raw_transaction_data_from(open_test_file("missing_headers.csv")).__next__()
+
+    assert "IBAN/BBAN" in error.value.missing
+    assert "Volgnr" in error.value.missing
+
+
+def test_fails_on_rows_with_too_few_columns() -> None:
+    with pytest.raises(ValueError, match="Row 2 has 4 columns"):
+        list(read_raw_transaction_data_from(open_test_file("faulty_transaction.csv")))
+
+
+def test_fingerprint_does_not_depend_on_chunk_size() -> None:
+    content = b"header\nrow 1\nrow 2"
+
+    assert fingerprint_of([content]) == fingerprint_of([content[:9], content[9:], b""])
+    assert fingerprint_of([content])[1] == 2
+    assert fingerprint_of([content + b"\n"])[1] == 2
+    assert fingerprint_of([])[1] == 0
+
+
+def test_reads_rows_of_archive_member_by_member() -> None:
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("b.csv", "".join(generate_test_file(3, "NL22RABO0104966666")))
+        zip_file.writestr("a.csv", "".join(generate_test_file(2, "NL11RABO0104955555")))
+        zip_file.writestr("readme.txt", "Not a transaction")
+
+    rows = read_archive_rows_from(archive)
+
+    assert next(rows).account_number == "NL11RABO0104955555"
+    assert [row.account_number[-1] for row in rows] == ["5", "6", "6", "6"]
@@ -2,8 +2,8 @@ from apps.transactions.models import Account
 from datetime import date
 from decimal import Decimal
 
-from apps.transactions.tests.utils import open_test_file
-from apps.transactions.utils.fileparser import AnonymousStorageHandler, FileParser
+from apps.transactions.tests.utils import generate_test_file, open_test_file
+from apps.transactions.utils.fileparser import AnonymousStorageHandler, FileParser, SequenceRange
 
 
 def test_creates_transaction_from_file() -> None:
@@ -72,3 +72,37 @@ def test_finds_other_party_based_on_name_if_empty_account_number() -> None:
     assert len(other_parties) == 2
     assert len([a for a in other_parties if a.name == "Beter Bed HEERLEN"]) == 1
     assert len([a for a in other_parties if a.name == "Lukoil TANKAUTOMAAT"]) == 1
+
+
+def test_keeps_first_account_when_looked_up_by_name_or_number() -> None:
+    storage_handler = AnonymousStorageHandler()
+    first = storage_handler.create_account(
+        Account(name="Albert Heijn", account_number="", is_user_owner=False)
+    )
+    storage_handler.create_account(
+        Account(name="Albert Heijn", account_number="", is_user_owner=False)
+    )
+
+    assert storage_handler.get_other_party_by("", "Albert Heijn") is first
+    assert storage_handler.get_receiver_by("") is first
+    assert len(storage_handler.accounts) == 2
+
+
+def test_parses_generated_file_with_shared_accounts() -> None:
+    result = FileParser(AnonymousStorageHandler()).parse(generate_test_file(5000))
+
+    assert result.amount_success == 5000
+    assert len(result.transactions) == 5000
+    assert len(result.accounts) == 51
+
+
+def test_sequence_ranges_merge_when_overlapping_or_adjacent() -> None:
+    assert SequenceRange(1, 10).merge(SequenceRange(5, 20)) == SequenceRange(1, 20)
+    assert SequenceRange(1, 10).merge(SequenceRange(11, 20)) == SequenceRange(1, 20)
+    assert SequenceRange(11, 20).merge(SequenceRange(1, 10)) == SequenceRange(1, 20)
+
+
+def test_sequence_ranges_keep_most_recent_when_apart() -> None:
+    """Otherwise the sequences in between would be seen as imported"""
+    assert SequenceRange(1, 10).merge(SequenceRange(50, 60)) == SequenceRange(50, 60)
+    assert SequenceRange(50, 60).merge(SequenceRange(1, 10)) == SequenceRange(50, 60)
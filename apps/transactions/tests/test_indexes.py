@@ -0,0 +1,86 @@
+from datetime import date
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import RequestFactory
+from django.urls import reverse
+
+from apps.transactions.models import Account, Transaction
+from apps.transactions.tests.factories import TransactionFactory, UserFactory
+from apps.transactions.views import TransactionListView
+
+if TYPE_CHECKING:
+    from apps.accounts.models import User
+else:
+    User = get_user_model()
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(
+        connection.vendor != "postgresql", reason="The plans are only checked on PostgreSQL"
+    ),
+]
+
+MONTH = date(2021, 6, 1)
+
+
+@pytest.fixture
+def user() -> User:
+    user = UserFactory()
+    TransactionFactory(user=user, date=MONTH)
+    return user
+
+
+def explain(queryset: QuerySet[Any]) -> str:
+    """The plan of a query, as if the tables were too big for a sequential scan"""
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+    return queryset.explain()
+
+
+def test_external_transactions_use_statistics_index(user: User) -> None:
+    queryset = Transaction.statistics.get_queryset_external_transactions(MONTH, user)
+
+    plan = explain(queryset)
+
+    assert "transaction_user_amount_idx" in plan or "transaction_user_date_id_idx" in plan
+
+
+@pytest.mark.parametrize("top", ["top_expenses", "top_incomes"])
+def test_top_transactions_use_statistics_index(user: User, top: str) -> None:
+    queryset = getattr(Transaction.statistics, top)(MONTH, user)
+
+    plan = explain(queryset)
+
+    assert "transaction_user_amount_idx" in plan
+
+
+def test_list_view_uses_date_index(user: User) -> None:
+    request = RequestFactory().get(reverse("transactions:index"), {"month": MONTH.isoformat()})
+    request.user = user
+    view = TransactionListView()
+    view.setup(request)
+
+    plan = explain(view.get_queryset())
+
+    assert "transaction_user_date_id_idx" in plan
+
+
+def test_search_uses_text_and_trigram_indexes(user: User) -> None:
+    plan = explain(Transaction.objects.search(user, "boodschappen"))
+
+    assert "transaction_memo_search_idx" in plan
+    assert "account_name_trgm_idx" in plan
+
+
+def test_counterparty_lookups_use_key_indexes(user: User) -> None:
+    by_number = explain(
+        Account.objects.filter(user=user, account_number_key="NL42RABO0000000001")
+    )
+    by_name = explain(Account.objects.filter(user=user, name_key="albert heijn 1234"))
+
+    assert "unique_account_number_key" in by_number
+    assert "account_user_name_key_idx" in by_name
@@ -1,10 +1,12 @@
 from datetime import date
 from decimal import Decimal
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Optional
 
 import pytest
 from django.contrib.auth import get_user_model
-from apps.transactions.models import Account, Transaction
+from django.core.management import call_command
+from apps.transactions.managers import to_copy_text
+from apps.transactions.models import Account, MonthlyTotal, Transaction
 from apps.transactions.tests.factories import (
     AccountFactory,
     OtherPartyFactory,
@@ -304,5 +306,268 @@ def test_gets_sum_external_expenses_and_incomes(user: User) -> None:
     assert Decimal("6500") == overview["incomes"]
 
 
+def test_dashboard_matches_separate_statistics(
+    user: User, django_assert_num_queries: Any
+) -> None:
+    month = date(2021, 6, 1)
+    receiver = ReceiverFactory(user=user)
+    own_account = OtherPartyFactory(user=user, is_user_owner=True)
+    for i, amount in enumerate(["-5", "-120", "-1.50", "-80", "-7", "-60", "0", "30", "2500"]):
+        TransactionFactory(
+            date=date(2021, 6, i + 1),
+            user=user,
+            receiver=receiver,
+            other_party=OtherPartyFactory(user=user, is_user_owner=False),
+            amount=Decimal(amount),
+        )
+    TransactionFactory(
+        date=month, user=user, receiver=receiver, other_party=own_account, amount=Decimal("-900")
+    )
+    TransactionFactory(
+        date=date(2021, 7, 1),
+        user=user,
+        receiver=receiver,
+        other_party=OtherPartyFactory(user=user, is_user_owner=False),
+        amount=Decimal("-1000"),
+    )
+
+    with django_assert_num_queries(1):
+        dashboard = Transaction.statistics.get_dashboard(month, user)
+        names = [t.other_party.name for t in dashboard["top_expenses"]]
+
+    totals = Transaction.statistics.get_external_totals(month, user)
+    assert dashboard["expenses"] == totals["expenses"] == Decimal("-273.50")
+    assert dashboard["incomes"] == totals["incomes"] == Decimal("2530.00")
+    assert dashboard["top_expenses"] == list(Transaction.statistics.top_expenses(month, user))
+    assert dashboard["top_incomes"] == list(Transaction.statistics.top_incomes(month, user))
+    assert names == [t.other_party.name for t in Transaction.statistics.top_expenses(month, user)]
+
+
+def test_dashboard_of_month_without_transactions(user: User) -> None:
+    dashboard = Transaction.statistics.get_dashboard(date(2021, 6, 1), user)
+
+    assert dashboard == {"expenses": None, "incomes": None, "top_expenses": [], "top_incomes": []}
+
+
+def test_inserts_only_transactions_with_new_codes(user: User) -> None:
+    existing = TransactionFactory(user=user, code="NL11RABO01")
+    transactions = [
+        Transaction(
+            date=date(2021, 6, 1),
+            amount=Decimal(f"-{i}"),
+            code=code,
+            currency="EUR",
+            user=user,
+            receiver=existing.receiver,
+            other_party=existing.other_party,
+        )
+        for i, code in enumerate(["NL11RABO01", "NL11RABO02", "NL11RABO03"])
+    ]
+
+    inserted = Transaction.objects.insert_new(transactions, batch_size=2)
+
+    assert [t.code for t in inserted] == ["NL11RABO02", "NL11RABO03"]
+    assert all(t.pk is not None for t in inserted)
+    assert Transaction.objects.get(code="NL11RABO03").amount == Decimal("-2")
+    assert Transaction.objects.get(code="NL11RABO01").pk == existing.pk
+
+
+def test_copies_only_transactions_with_new_codes(user: User) -> None:
+    """Other databases than PostgreSQL take the insert_new path"""
+    existing = TransactionFactory(user=user, code="NL11RABO01")
+    transactions = [
+        Transaction(
+            date=date(2021, 6, 1),
+            amount=Decimal("-1"),
+            code=code,
+            currency="EUR",
+            memo="Tab\tand\\newline\n" if code == "NL11RABO02" else None,
+            user=user,
+            receiver=existing.receiver,
+            other_party=existing.other_party,
+        )
+        for code in ["NL11RABO01", "NL11RABO02", "NL11RABO03"]
+    ]
+
+    inserted = Transaction.objects.copy_new(transactions, batch_size=2)
+
+    assert [t.code for t in inserted] == ["NL11RABO02", "NL11RABO03"]
+    assert Transaction.objects.get(code="NL11RABO02").memo == "Tab\tand\\newline\n"
+    assert Transaction.objects.get(code="NL11RABO03").memo is None
+
+
+def test_escapes_copy_text() -> None:
+    assert to_copy_text(None) == "\\N"
+    assert to_copy_text("a\tb\\c\nd\re") == "a\\tb\\\\c\\nd\\re"
+    assert to_copy_text(Decimal("-2.50")) == "-2.50"
+
+
 # def test_gets_sum_external_incomes():
 # pass
+
+
+def test_keeps_monthly_totals_up_to_date(user: User) -> None:
+    receiver = ReceiverFactory(user=user)
+    other_party = OtherPartyFactory(user=user)
+    for day, amount in [(1, "-10"), (2, "-2.50"), (3, "100"), (30, "-1")]:
+        TransactionFactory(
+            date=date(2021, 6, day),
+            user=user,
+            receiver=receiver,
+            other_party=other_party,
+            amount=Decimal(amount),
+        )
+    TransactionFactory(
+        date=date(2021, 7, 1),
+        user=user,
+        receiver=receiver,
+        other_party=other_party,
+        amount=Decimal("-5"),
+    ).delete()
+
+    total = MonthlyTotal.objects.get(user=user, month=date(2021, 6, 1))
+    assert (total.incomes, total.expenses) == (Decimal("100"), Decimal("-13.50"))
+    assert (total.income_count, total.expense_count) == (1, 3)
+    deleted = MonthlyTotal.objects.get(user=user, month=date(2021, 7, 1))
+    assert (deleted.expenses, deleted.expense_count) == (Decimal("0"), 0)
+
+
+def test_deleted_transaction_is_taken_off_the_totals_like_a_model(user: User) -> None:
+    receiver = ReceiverFactory(user=user)
+    other_party = OtherPartyFactory(user=user)
+    kept, deleted = [
+        TransactionFactory(
+            date=date(2021, 6, 1),
+            user=user,
+            receiver=receiver,
+            other_party=other_party,
+            amount=Decimal("-1"),
+        )
+        for _ in range(2)
+    ]
+
+    assert deleted.delete(using="default") == (1, {"transactions.Transaction": 1})
+    assert deleted.pk is None
+    Transaction.statistics.filter(pk=kept.pk).delete()
+
+    total = MonthlyTotal.objects.get(user=user, month=date(2021, 6, 1))
+    assert (total.expenses, total.expense_count) == (Decimal("0"), 0)
+
+
+def test_deletes_transactions_with_one_update_per_total(
+    user: User, django_assert_num_queries: Any
+) -> None:
+    receiver = ReceiverFactory(user=user)
+    other_party = OtherPartyFactory(user=user)
+    for i in range(50):
+        TransactionFactory(
+            date=date(2021, 6 + i % 2, 1),
+            user=user,
+            receiver=receiver,
+            other_party=other_party,
+            amount=Decimal("-1"),
+        )
+
+    # A savepoint around the sums per total, the update of the June total, the watermarks of
+    # the receivers (select and delete) and the delete
+    with django_assert_num_queries(7):
+        Transaction.objects.filter(user=user, date__month=6).delete()
+
+    assert sorted(MonthlyTotal.objects.values_list("month", "expenses", "expense_count")) == [
+        (date(2021, 6, 1), Decimal("0"), 0),
+        (date(2021, 7, 1), Decimal("-25"), 25),
+    ]
+
+
+def test_deletes_account_with_many_transactions_in_fixed_amount_of_queries(
+    user: User, django_assert_num_queries: Any
+) -> None:
+    receiver = ReceiverFactory(user=user)
+    other_party = OtherPartyFactory(user=user)
+    for i in range(50):
+        TransactionFactory(
+            date=date(2021, 1 + i % 12, 1), user=user, receiver=receiver, other_party=other_party
+        )
+
+    # The watermarks of the receivers (select and delete), then the transactions, totals and
+    # recurrences of the account are deleted without loading them
+    with django_assert_num_queries(6):
+        other_party.delete()
+
+    assert not Transaction.objects.filter(user=user).exists()
+    assert not MonthlyTotal.objects.filter(user=user).exists()
+
+
+def test_rebuilds_monthly_totals(user: User) -> None:
+    for i in range(6):
+        TransactionFactory(
+            date=date(2021, 5 + i % 2, 1 + i), user=user, amount=Decimal(f"-{i + 1}")
+        )
+    expected = sorted(MonthlyTotal.objects.values_list("month", "expenses", "expense_count"))
+    MonthlyTotal.objects.update(expenses=0)
+
+    call_command("rebuild_monthly_totals", f"--user={user.username}")
+
+    assert sorted(MonthlyTotal.objects.values_list("month", "expenses", "expense_count")) == (
+        expected
+    )
+
+
+def test_searches_memos_and_counterparties_of_user(user: User) -> None:
+    hema = OtherPartyFactory(user=user, name="Hema Utrecht")
+    groceries = TransactionFactory(user=user, memo="Boodschappen week 12", date=date(2021, 6, 1))
+    older = TransactionFactory(user=user, memo="Boodschappen week 11", date=date(2021, 5, 1))
+    shopping = TransactionFactory(user=user, other_party=hema, memo="Pinbetaling")
+    TransactionFactory(memo="Boodschappen van iemand anders")
+
+    assert list(Transaction.objects.search(user, "boodschappen")) == [groceries, older]
+    assert list(Transaction.objects.search(user, "hema utrecht")) == [shopping]
+
+
+def test_gets_monthly_series_of_range(user: User) -> None:
+    receiver = ReceiverFactory(user=user)
+    other_party = OtherPartyFactory(user=user)
+    own_account = OtherPartyFactory(user=user, is_user_owner=True)
+    for day, amount, account in [
+        (date(2021, 1, 5), "-10", other_party),
+        (date(2021, 1, 20), "250", other_party),
+        (date(2021, 3, 1), "-4", other_party),
+        (date(2021, 3, 2), "-100", own_account),
+        (date(2021, 4, 1), "-1", other_party),
+    ]:
+        TransactionFactory(
+            date=day, user=user, receiver=receiver, other_party=account, amount=Decimal(amount)
+        )
+
+    series = Transaction.statistics.get_monthly_series(date(2021, 1, 15), date(2021, 3, 1), user)
+
+    assert series == [
+        {"month": date(2021, 1, 1), "incomes": Decimal("250"), "expenses": Decimal("-10")},
+        {"month": date(2021, 2, 1), "incomes": Decimal("0"), "expenses": Decimal("0")},
+        {"month": date(2021, 3, 1), "incomes": Decimal("0"), "expenses": Decimal("-4")},
+    ]
+
+
+def test_gets_counterparty_totals_of_range(user: User) -> None:
+    receiver = ReceiverFactory(user=user)
+    shop = OtherPartyFactory(user=user, name="Shop")
+    employer = OtherPartyFactory(user=user, name="Employer")
+    for day, amount, account in [
+        (date(2021, 1, 5), "-10", shop),
+        (date(2021, 2, 5), "-20", shop),
+        (date(2021, 2, 5), "5", shop),
+        (date(2021, 2, 25), "2000", employer),
+        (date(2021, 3, 5), "-30", shop),
+    ]:
+        TransactionFactory(
+            date=day, user=user, receiver=receiver, other_party=account, amount=Decimal(amount)
+        )
+
+    totals = Transaction.statistics.get_counterparty_totals(
+        date(2021, 1, 15), date(2021, 3, 1), user
+    )
+
+    assert [
+        (total["other_party__name"], total["incomes"], total["expenses"], total["count"])
+        for total in totals
+    ] == [("Shop", Decimal("5"), Decimal("-20"), 2), ("Employer", Decimal("2000"), Decimal("0"), 1)]
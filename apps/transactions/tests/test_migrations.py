@@ -0,0 +1,138 @@
+from datetime import date
+from decimal import Decimal
+from typing import Any, Iterator, List, Tuple
+
+import pytest
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def migrate(targets: List[Tuple[str, str]]) -> Any:
+    """Migrates the database to the targets and returns the models as they were then"""
+    executor = MigrationExecutor(connection)
+    executor.migrate(targets)
+    return executor.loader.project_state(targets).apps
+
+
+@pytest.fixture
+def migrate_back_to_latest() -> Iterator[None]:
+    yield
+    executor = MigrationExecutor(connection)
+    executor.migrate(executor.loader.graph.leaf_nodes())
+
+
+def test_account_lookup_keys_merge_accounts_per_user(migrate_back_to_latest: None) -> None:
+    apps = migrate([("transactions", "0012_recurrences")])
+    User = apps.get_model("accounts", "User")
+    Account = apps.get_model("transactions", "Account")
+    Transaction = apps.get_model("transactions", "Transaction")
+    SequenceWatermark = apps.get_model("transactions", "SequenceWatermark")
+
+    alice = User.objects.create(username="alice", password="-")
+    bob = User.objects.create(username="bob", password="-")
+    own = Account.objects.create(
+        user=alice, name="Alice", account_number="NL11RABO0104955555", is_user_owner=True
+    )
+    # The same account, printed differently in the export of another account
+    own_printed = Account.objects.create(
+        user=alice, name="ALICE", account_number="nl11 rabo 0104 9555 55", is_user_owner=False
+    )
+    # Counterparties used to be shared between users
+    hema = Account.objects.create(
+        user=alice, name="Hema", account_number="NL42RABO0114164838", is_user_owner=False
+    )
+    bob_own = Account.objects.create(
+        user=bob, name="Bob", account_number="NL22RABO0104966666", is_user_owner=True
+    )
+    for code, user, receiver in [
+        ("1", alice, own),
+        ("2", alice, own_printed),
+        ("3", bob, bob_own),
+    ]:
+        Transaction.objects.create(
+            code=code,
+            date=date(2021, 6, 1),
+            amount=Decimal("-1"),
+            currency="EUR",
+            user=user,
+            receiver=receiver,
+            other_party=hema,
+        )
+    SequenceWatermark.objects.create(
+        user=alice, account_number="NL11RABO0104955555", low=0, high=4
+    )
+    SequenceWatermark.objects.create(
+        user=alice, account_number="nl11 rabo 0104 9555 55", low=5, high=9
+    )
+
+    apps = migrate([("transactions", "0013_account_lookup_keys")])
+    Account = apps.get_model("transactions", "Account")
+    Transaction = apps.get_model("transactions", "Transaction")
+    MonthlyTotal = apps.get_model("transactions", "MonthlyTotal")
+    SequenceWatermark = apps.get_model("transactions", "SequenceWatermark")
+
+    alice_accounts = Account.objects.filter(user=alice.pk)
+    assert sorted(alice_accounts.values_list("pk", "is_user_owner")) == [
+        (own.pk, True),
+        (hema.pk, False),
+    ]
+    alice_transactions = Transaction.objects.filter(user=alice.pk)
+    assert set(alice_transactions.values_list("receiver", flat=True)) == {own.pk}
+    bob_hema = Transaction.objects.get(user=bob.pk).other_party
+    assert bob_hema.pk != hema.pk
+    assert (bob_hema.user_id, bob_hema.account_number_key) == (bob.pk, "NL42RABO0114164838")
+    assert MonthlyTotal.objects.get(user=alice.pk).expense_count == 2
+    assert list(SequenceWatermark.objects.values_list("account_number", "low", "high")) == [
+        ("NL11RABO0104955555", 0, 9)
+    ]
+
+
+def test_account_lookup_keys_detect_recurrences_of_merged_accounts_again(
+    migrate_back_to_latest: None,
+) -> None:
+    apps = migrate([("transactions", "0012_recurrences")])
+    User = apps.get_model("accounts", "User")
+    Account = apps.get_model("transactions", "Account")
+    Transaction = apps.get_model("transactions", "Transaction")
+    Recurrence = apps.get_model("transactions", "Recurrence")
+
+    alice = User.objects.create(username="alice", password="-")
+    own = Account.objects.create(
+        user=alice, name="Alice", account_number="NL11RABO0104955555", is_user_owner=True
+    )
+    own_printed = Account.objects.create(
+        user=alice, name="ALICE", account_number="nl11 rabo 0104 9555 55", is_user_owner=False
+    )
+    netflix = Account.objects.create(
+        user=alice, name="Netflix", account_number="NL42RABO0114164838", is_user_owner=False
+    )
+    for month in range(1, 5):
+        Transaction.objects.create(
+            code=str(month),
+            date=date(2021, month, 3),
+            amount=Decimal("-12.99"),
+            currency="EUR",
+            user=alice,
+            receiver=own if month % 2 else own_printed,
+            other_party=netflix,
+        )
+    # Found in the months paid from the first account only
+    Recurrence.objects.create(
+        user=alice,
+        other_party=netflix,
+        period=30,
+        amount=Decimal("-12.99"),
+        occurrences=2,
+        first_date=date(2021, 1, 3),
+        last_date=date(2021, 3, 3),
+        next_date=date(2021, 4, 3),
+    )
+
+    apps = migrate([("transactions", "0013_account_lookup_keys")])
+    Recurrence = apps.get_model("transactions", "Recurrence")
+
+    recurrence = Recurrence.objects.get(user=alice.pk)
+    assert (recurrence.other_party_id, recurrence.period) == (netflix.pk, 30)
+    assert (recurrence.occurrences, recurrence.next_date) == (4, date(2021, 5, 3))
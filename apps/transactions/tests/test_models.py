@@ -1,13 +1,21 @@
+import tracemalloc
 from datetime import date
 from decimal import Decimal
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple
 
 import pytest
 from django.contrib.auth import get_user_model
-from apps.transactions.models import Account, Transaction
-from apps.transactions.tests.factories import UserFactory
-from apps.transactions.tests.utils import open_test_file
-from apps.transactions.utils.fileparser import FileParser, ModelStorageHandler
+from django.db import transaction as db_transaction
+from django.db.models import Value
+from django.db.models.functions import Concat
+from apps.transactions.models import Account, MonthlyTotal, SequenceWatermark, Transaction
+from apps.transactions.tests.factories import ReceiverFactory, TransactionFactory, UserFactory
+from apps.transactions.tests.utils import HEADERS, generate_test_file, open_test_file
+from apps.transactions.utils.fileparser import (
+    BulkModelStorageHandler,
+    FileParser,
+    ModelStorageHandler,
+)
 
 if TYPE_CHECKING:
     from apps.accounts.models import User
@@ -87,3 +95,295 @@ def test_marks_transaction_as_duplicate(user: User) -> None:
 
     assert result.amount_success == 2
     assert result.amount_duplicate == 1
+
+
+def test_bulk_creates_transaction_from_file(user: User) -> None:
+    file = open_test_file("single_dummy.csv")
+    result = FileParser(BulkModelStorageHandler(user)).parse(file)
+
+    transaction: Optional[Transaction] = Transaction.objects.first()
+
+    assert result.amount_success == 1
+    assert result.amount_duplicate == 0
+    assert transaction is not None
+    assert transaction.code == "NL11RABO0104955555000000000000007213"
+    assert transaction.user.id == user.id
+    assert transaction.receiver.account_number == "NL11RABO0104955555"
+    assert transaction.other_party.name == "J.M.G. Kerkhoffs eo"
+
+
+def test_bulk_marks_transaction_as_duplicate(user: User) -> None:
+    FileParser(BulkModelStorageHandler(user)).parse(open_test_file("single_dummy.csv"))
+
+    result = FileParser(BulkModelStorageHandler(user)).parse(
+        open_test_file("duplicate_transaction.csv")
+    )
+
+    assert result.amount_success == 1
+    assert result.amount_duplicate == 2
+    assert len(Transaction.objects.all()) == 2
+    assert len(Account.objects.all()) == 4
+
+
+def test_bulk_counts_transactions_the_database_skipped_as_duplicate(user: User) -> None:
+    receiver = ReceiverFactory(user=user, account_number="NL11RABO0104955555")
+    TransactionFactory(user=user, receiver=receiver, code="NL11RABO0104955555000000000000007213")
+
+    result = FileParser(BulkModelStorageHandler(user)).parse(open_test_file("duplicate_account.csv"))
+
+    assert result.amount_success == 1
+    assert result.amount_duplicate == 1
+    assert len(Transaction.objects.all()) == 2
+
+
+def test_bulk_marks_existing_account_as_user_owner(user: User) -> None:
+    Account.objects.create(
+        name="Savings", account_number="NL42RABO0114164838", is_user_owner=False, user=user
+    )
+
+    result = FileParser(BulkModelStorageHandler(user)).parse(
+        open_test_file("is_user_owner_switch.csv")
+    )
+
+    assert result.amount_success == 2
+    assert Account.objects.get(account_number="NL42RABO0114164838").is_user_owner is True
+    assert len(Account.objects.all()) == 3
+
+
+def test_bulk_reports_same_counts_as_row_by_row(user: User) -> None:
+    expected = FileParser(ModelStorageHandler(UserFactory())).parse(
+        open_test_file("is_user_owner_switch.csv")
+    )
+    Transaction.objects.all().delete()
+    Account.objects.all().delete()
+
+    result = FileParser(BulkModelStorageHandler(user), batch_size=1).parse(
+        open_test_file("is_user_owner_switch.csv")
+    )
+
+    assert result.amount_success == expected.amount_success
+    assert result.amount_duplicate == expected.amount_duplicate
+    assert len(Transaction.objects.filter(user=user)) == 2
+
+
+def test_bulk_uses_a_fixed_amount_of_queries(
+    user: User, django_assert_max_num_queries  # type: ignore
+) -> None:
+    file = open_test_file("duplicate_account.csv")
+
+    # savepoint, watermarks, stored codes, accounts, account insert, account pks, own account
+    # update, category rules, transaction insert, monthly totals upsert, watermark
+    # get_or_create (select, savepoint, insert, release), release
+    with django_assert_max_num_queries(15):
+        result = FileParser(BulkModelStorageHandler(user)).parse(file)
+
+    assert result.amount_success == 2
+
+
+def test_bulk_uses_accounts_another_import_created_meanwhile(
+    user: User, monkeypatch: Any
+) -> None:
+    storage = BulkModelStorageHandler(user)
+    flush = storage.flush
+
+    def flush_after_other_import() -> int:
+        # Between the preload and the flush of the batch
+        Account.objects.create(
+            user=user, name="Own account", account_number="NL11RABO0104955555", is_user_owner=False
+        )
+        Account.objects.create(
+            user=user, name="Party 0", account_number="NL42RABO0000000000", is_user_owner=False
+        )
+        return flush()
+
+    monkeypatch.setattr(storage, "flush", flush_after_other_import)
+    result = FileParser(storage).parse(generate_test_file(3, other_parties=1))
+
+    assert result.amount_success == 3
+    receiver, other_party = Account.objects.filter(user=user).order_by("account_number")
+    assert receiver.is_user_owner
+    assert list(Transaction.objects.values_list("receiver", "other_party").distinct()) == [
+        (receiver.pk, other_party.pk)
+    ]
+
+
+def test_bulk_adds_imported_transactions_to_monthly_totals(user: User) -> None:
+    FileParser(BulkModelStorageHandler(user), batch_size=7).parse(generate_test_file(20))
+    FileParser(BulkModelStorageHandler(user), batch_size=7).parse(generate_test_file(30))
+
+    totals = MonthlyTotal.objects.filter(user=user)
+    assert sum(total.expense_count for total in totals) == 30
+    assert sum(total.expenses for total in totals) == sum(
+        transaction.amount for transaction in Transaction.objects.filter(user=user)
+    )
+
+
+def test_bulk_streams_running_report_per_batch(user: User) -> None:
+    parser = FileParser(BulkModelStorageHandler(user), batch_size=2)
+
+    processed = [report.amount_processed for report in parser.stream(generate_test_file(5))]
+
+    assert processed == [2, 4, 5]
+    assert len(Transaction.objects.all()) == 5
+
+
+def test_bulk_import_memory_does_not_grow_with_file_size(user: User) -> None:
+    def peak_memory_of_import(amount: int, account_number: str) -> int:
+        tracemalloc.start()
+        report = FileParser(BulkModelStorageHandler(user), batch_size=500).parse(
+            generate_test_file(amount, account_number=account_number)
+        )
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert report.amount_success == amount
+        return peak
+
+    small = peak_memory_of_import(1000, "NL11RABO0000000001")
+    large = peak_memory_of_import(8000, "NL11RABO0000000002")
+
+    assert large < 4 * 1024 * 1024
+    assert large < small * 2
+
+
+def test_bulk_keeps_imported_sequence_range_per_account(user: User) -> None:
+    FileParser(BulkModelStorageHandler(user)).parse(generate_test_file(5))
+    FileParser(BulkModelStorageHandler(user)).parse(open_test_file("is_user_owner_switch.csv"))
+
+    marks = {m.account_number: (m.low, m.high) for m in SequenceWatermark.objects.filter(user=user)}
+
+    assert marks == {"NL11RABO0104955555": (7213, 7213), "NL42RABO0114164838": (7213, 7213)}
+
+
+def test_bulk_discards_imported_sequences_before_duplicate_check(user: User) -> None:
+    FileParser(BulkModelStorageHandler(user)).parse(generate_test_file(5))
+    # Only the watermark can tell that these were imported
+    Transaction.objects.update(code=Concat("code", Value("-before")))
+
+    result = FileParser(BulkModelStorageHandler(user)).parse(generate_test_file(8))
+
+    assert result.amount_duplicate == 5
+    assert result.amount_success == 3
+    assert SequenceWatermark.objects.get(user=user).high == 7
+
+
+def test_bulk_stored_rows_outside_watermark_do_not_touch_accounts(user: User) -> None:
+    FileParser(BulkModelStorageHandler(user)).parse(generate_test_file(5))
+    SequenceWatermark.objects.all().delete()
+    Account.objects.filter(is_user_owner=True).update(is_user_owner=False)
+    accounts = len(Account.objects.all())
+
+    result = FileParser(BulkModelStorageHandler(user)).parse(generate_test_file(5))
+
+    assert result.amount_duplicate == 5
+    assert len(Account.objects.all()) == accounts
+    assert not Account.objects.filter(is_user_owner=True).exists()
+
+
+def test_bulk_imports_deleted_transactions_again(user: User) -> None:
+    FileParser(BulkModelStorageHandler(user)).parse(generate_test_file(5))
+    Transaction.objects.filter(code__endswith="3").delete()
+
+    result = FileParser(BulkModelStorageHandler(user)).parse(generate_test_file(5))
+
+    assert (result.amount_success, result.amount_duplicate) == (1, 4)
+    mark = SequenceWatermark.objects.get(user=user)
+    assert (mark.low, mark.high) == (0, 4)
+
+
+def test_bulk_imports_transactions_of_deleted_account_again(user: User) -> None:
+    FileParser(BulkModelStorageHandler(user)).parse(generate_test_file(5, other_parties=2))
+    Transaction.objects.first().other_party.delete()
+    deleted = 5 - len(Transaction.objects.all())
+
+    result = FileParser(BulkModelStorageHandler(user)).parse(
+        generate_test_file(5, other_parties=2)
+    )
+
+    assert deleted > 0
+    assert (result.amount_success, result.amount_duplicate) == (deleted, 5 - deleted)
+
+
+def test_bulk_keeps_sequence_range_per_account_number_key(user: User) -> None:
+    FileParser(BulkModelStorageHandler(user)).parse(generate_test_file(5))
+
+    result = FileParser(BulkModelStorageHandler(user)).parse(
+        generate_test_file(8, account_number="nl11 rabo 0104 9555 55")
+    )
+
+    assert result.amount_duplicate == 5
+    mark = SequenceWatermark.objects.get(user=user)
+    assert (mark.account_number, mark.low, mark.high) == ("NL11RABO0104955555", 0, 7)
+
+
+def test_bulk_counts_rows_that_can_not_be_read_as_failed(user: User) -> None:
+    lines = list(generate_test_file(5))
+    lines[3] = lines[3].replace('"-3,50"', '"-3,5O"')
+
+    result = FileParser(BulkModelStorageHandler(user)).parse(lines)
+    fixed = FileParser(BulkModelStorageHandler(user)).parse(generate_test_file(5))
+
+    assert (result.amount_success, result.amount_failed) == (4, 1)
+    # Without a watermark for its account the row is imported once the file is fixed
+    assert (fixed.amount_success, fixed.amount_duplicate) == (1, 4)
+
+
+def test_bulk_rolled_back_import_does_not_move_watermark(user: User) -> None:
+    FileParser(BulkModelStorageHandler(user)).parse(generate_test_file(5))
+
+    with pytest.raises(RuntimeError):
+        with db_transaction.atomic():
+            FileParser(BulkModelStorageHandler(user)).parse(generate_test_file(8))
+            raise RuntimeError()
+
+    mark = SequenceWatermark.objects.get(user=user)
+    assert (mark.low, mark.high) == (0, 4)
+    assert len(Transaction.objects.all()) == 5
+
+
+def rows_with_other_parties(*other_parties: Tuple[str, str]) -> List[str]:
+    """An export with a payment to every (account number, name)"""
+    return [HEADERS] + [
+        f'"NL11RABO0104955555","EUR","RABONL2U","{i:018}","2021-06-01","2021-06-01","-1,50",'
+        f'"+100,00","{account_number}","{name}","","","RABONL2U","cb","","","","","",'
+        f'"Payment {i}","","","","","",""\n'
+        for i, (account_number, name) in enumerate(other_parties)
+    ]
+
+
+@pytest.mark.parametrize("storage_handler", [ModelStorageHandler, BulkModelStorageHandler])
+def test_resolves_counterparties_by_normalised_keys(user: User, storage_handler: type) -> None:
+    file = rows_with_other_parties(
+        ("", "ALBERT HEIJN 1234"),
+        ("", "Albert  Heijn 1234 "),
+        ("NL42RABO0000000001", "Jumbo"),
+        ("nl42 rabo 0000 0000 01", "JUMBO"),
+        ("", "Lidl"),
+    )
+
+    result = FileParser(storage_handler(user), batch_size=2).parse(file)
+
+    assert result.amount_success == 5
+    other_parties = Account.objects.filter(user=user, is_user_owner=False)
+    assert sorted(other_parties.values_list("name_key", flat=True)) == [
+        "albert heijn 1234",
+        "jumbo",
+        "lidl",
+    ]
+    assert other_parties.get(name_key="jumbo").account_number_key == "NL42RABO0000000001"
+
+
+@pytest.mark.parametrize("storage_handler", [ModelStorageHandler, BulkModelStorageHandler])
+def test_does_not_use_counterparties_of_other_users(user: User, storage_handler: type) -> None:
+    other_user = UserFactory()
+    Account.objects.create(
+        name="Jumbo", account_number="NL42RABO0000000001", is_user_owner=False, user=other_user
+    )
+    Account.objects.create(name="Lidl", account_number="", is_user_owner=False, user=other_user)
+
+    FileParser(storage_handler(user)).parse(
+        rows_with_other_parties(("NL42RABO0000000001", "Jumbo"), ("", "Lidl"))
+    )
+
+    assert Transaction.objects.filter(user=user, other_party__user=other_user).count() == 0
+    assert Account.objects.filter(user=user, is_user_owner=False).count() == 2
+    assert Account.objects.filter(user=other_user).count() == 2
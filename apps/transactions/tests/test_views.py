@@ -1,14 +1,33 @@
+import csv
+import io
+import json
+import tempfile
+import zipfile
 from datetime import date
+from decimal import Decimal
+from typing import Any
 
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth import get_user_model
-from django.test import TestCase, RequestFactory, Client
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, RequestFactory, Client, override_settings
+from django.http import Http404
 from django.urls import reverse
 
-from .factories import UserFactory, TransactionFactory
-from .utils import open_test_file
-from ..models import Transaction
-from ..views import TransactionListView, UploadAnonymousTransactionsFormView, UploadTransactionsFormView
+from .factories import OtherPartyFactory, ReceiverFactory, UserFactory, TransactionFactory
+from .utils import generate_test_file, open_test_file
+from ..models import Account, ImportJob, Recurrence, Transaction
+from ..utils.importjobs import run_pending_jobs
+from ..views import (
+    ImportJobStatusView,
+    RecurrenceListView,
+    TransactionExportView,
+    TransactionListView,
+    TransactionSearchView,
+    UploadAnonymousTransactionsFormView,
+    UploadTransactionsFormView,
+    YearOverviewView,
+)
 
 User = get_user_model()
 
@@ -55,6 +74,53 @@ class TransactionListViewTestCase(TestCase):
         self.assertContains(response, transaction.other_party.name)
         self.assertNotContains(response, transaction_excluded.other_party.name)
 
+    def test_builds_dashboard_in_fixed_amount_of_queries(self) -> None:
+        month = date.today() - relativedelta(months=1)
+        for _ in range(30):
+            TransactionFactory(date=month, user=self.user)
+        request = self.factory.get(reverse('transactions:index'))
+        request.user = self.user
+
+        # The page and the dashboard
+        with self.assertNumQueries(2):
+            response = TransactionListView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context_data['top_incomes']), 5)
+
+    def test_renders_page_without_querying_per_transaction(self) -> None:
+        month = date.today() - relativedelta(months=1)
+        for amount in ('-1', '-2', '-3', '-4', '-5', '-6', '1', '2', '3', '4', '5', '6') * 2:
+            TransactionFactory(date=month, user=self.user, amount=Decimal(amount))
+        request = self.factory.get(reverse('transactions:index'))
+        request.user = self.user
+
+        # The page and the dashboard
+        with self.assertNumQueries(2):
+            response = TransactionListView.as_view()(request)
+            response.render()
+
+        self.assertContains(response, 'Top expenses')
+
+    def test_pages_with_cursors(self) -> None:
+        month = date.today() - relativedelta(months=1)
+        for _ in range(25):
+            TransactionFactory(date=month, user=self.user)
+        request = self.factory.get(reverse('transactions:index'))
+        request.user = self.user
+        first = TransactionListView.as_view()(request).context_data
+
+        request = self.factory.get(
+            reverse('transactions:index'), {'cursor': first['page_obj'].next_cursor}
+        )
+        request.user = self.user
+        second = TransactionListView.as_view()(request).context_data
+
+        self.assertEqual(len(first['transactions']), 20)
+        self.assertEqual(len(second['transactions']), 5)
+        self.assertTrue(second['page_obj'].has_previous())
+        self.assertFalse(second['page_obj'].has_next())
+
     def test_gets_only_user_owned_transactions(self) -> None:
         now = date.today() - relativedelta(months=1)
         transaction = TransactionFactory(date=now, user=self.user)
@@ -69,21 +135,247 @@ class TransactionListViewTestCase(TestCase):
         self.assertNotContains(response, transaction_excluded.other_party.name)
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class YearOverviewViewTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = UserFactory()
+        self.factory = RequestFactory()
+
+    def test_compares_year_with_previous_year_in_fixed_amount_of_queries(self) -> None:
+        for year, amount in [(2020, '-30'), (2020, '-20'), (2021, '-5'), (2021, '100')]:
+            TransactionFactory(user=self.user, date=date(year, 6, 1), amount=Decimal(amount))
+        request = self.factory.get(reverse('transactions:year'), {'year': 2021})
+        request.user = self.user
+
+        # The monthly series of both years and the counterparties of each year
+        with self.assertNumQueries(3):
+            response = YearOverviewView.as_view()(request)
+            response.render()
+
+        june = response.context_data['months'][5]
+        self.assertEqual(june['expenses'], Decimal('-5'))
+        self.assertEqual(june['previous_expenses'], Decimal('-50'))
+        self.assertEqual(response.context_data['incomes'], Decimal('100'))
+        self.assertEqual(len(response.context_data['months']), 12)
+
+    def test_returns_404_for_years_without_dates(self) -> None:
+        for year in ['0', '1', '10000', 'twee']:
+            request = self.factory.get(reverse('transactions:year'), {'year': year})
+            request.user = self.user
+
+            with self.assertRaises(Http404):
+                YearOverviewView.as_view()(request)
+
+
+class TransactionExportViewTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = UserFactory()
+        self.factory = RequestFactory()
+
+    def export(self, export_format: str, **filters: str) -> Any:
+        request = self.factory.get(
+            reverse('transactions:export', kwargs={'export_format': export_format}), filters
+        )
+        request.user = self.user
+        return TransactionExportView.as_view()(request, export_format=export_format)
+
+    def test_streams_csv_header_before_querying(self) -> None:
+        TransactionFactory(user=self.user, memo='Huur', amount=Decimal('-750.00'))
+        response = self.export('csv')
+        content = iter(response.streaming_content)
+
+        with self.assertNumQueries(0):
+            header = next(content)
+
+        rows = list(csv.reader(io.StringIO(b''.join(content).decode())))
+        self.assertTrue(response.streaming)
+        self.assertTrue(header.startswith(b'date,amount,currency'))
+        self.assertEqual(rows[0][1], '-750.00')
+        self.assertEqual(rows[0][-2], 'Huur')
+
+    def test_streams_ndjson_between_dates_of_an_account(self) -> None:
+        included = TransactionFactory(user=self.user, date=date(2021, 6, 1))
+        TransactionFactory(user=self.user, date=date(2021, 5, 31), receiver=included.receiver)
+        TransactionFactory(user=self.user, date=date(2021, 6, 2))
+        TransactionFactory(date=date(2021, 6, 1))
+
+        response = self.export(
+            'ndjson', start='2021-06-01', end='2021-06-30', account=included.receiver.account_number
+        )
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['code'] for line in lines], [included.code])
+
+    def test_filters_on_the_account_however_it_is_written(self) -> None:
+        receiver = ReceiverFactory(user=self.user, account_number='NL11RABO0104955555')
+        included = TransactionFactory(user=self.user, receiver=receiver)
+        TransactionFactory(user=self.user)
+
+        response = self.export('ndjson', account='nl11 rabo 0104 9555 55')
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['code'] for line in lines], [included.code])
+
+    def test_rejects_invalid_filters(self) -> None:
+        response = self.export('csv', start='yesterday')
+
+        self.assertEqual(response.status_code, 400)
+
+
+class TransactionSearchViewTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = UserFactory()
+        self.factory = RequestFactory()
+
+    def test_shows_matching_transactions(self) -> None:
+        TransactionFactory(user=self.user, memo='Energierekening juni')
+        TransactionFactory(user=self.user, memo='Boodschappen')
+        request = self.factory.get(reverse('transactions:search'), {'q': 'energierekening'})
+        request.user = self.user
+
+        response = TransactionSearchView.as_view()(request)
+
+        self.assertContains(response, 'Energierekening juni')
+        self.assertNotContains(response, 'Boodschappen')
+
+    def test_shows_nothing_without_query(self) -> None:
+        TransactionFactory(user=self.user, memo='Huur juni')
+        request = self.factory.get(reverse('transactions:search'))
+        request.user = self.user
+
+        response = TransactionSearchView.as_view()(request)
+
+        self.assertNotContains(response, 'Huur juni')
+
+
+class RecurrenceListViewTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = UserFactory()
+        self.factory = RequestFactory()
+
+    def test_shows_recurrences_of_user(self) -> None:
+        for user, name in [(self.user, 'Sportschool'), (UserFactory(), 'Krant')]:
+            Recurrence.objects.create(
+                user=user,
+                other_party=OtherPartyFactory(user=user, name=name),
+                period=Recurrence.Period.MONTHLY,
+                amount=Decimal('-25.00'),
+                occurrences=6,
+                first_date=date(2021, 1, 1),
+                last_date=date(2021, 6, 1),
+                next_date=date(2021, 7, 1),
+            )
+        request = self.factory.get(reverse('transactions:recurrences'))
+        request.user = self.user
+
+        response = RecurrenceListView.as_view()(request)
+
+        self.assertContains(response, 'Sportschool')
+        self.assertContains(response, 'Monthly')
+        self.assertNotContains(response, 'Krant')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class UploadTransactionsFormViewTestCase(TestCase):
     def setUp(self) -> None:
         self.user = UserFactory()
         self.factory = RequestFactory()
 
-    def test_redirects_after_successful_upload(self) -> None:
+    def test_redirects_to_import_job_after_successful_upload(self) -> None:
         post_data = {'file': open_test_file('single_dummy.csv')}
         request = self.factory.post(reverse('transactions:upload'), data=post_data)
         request.user = self.user
 
         response = UploadTransactionsFormView.as_view()(request)
 
+        job = ImportJob.objects.get(user=self.user)
         self.assertEqual(response.status_code, 302)
-        self.assertEqual(f'{response.url}/', reverse('transactions:index'))
-        self.assertEqual(len(Transaction.objects.all()), 1)
+        self.assertEqual(response.url, reverse('transactions:import-job', kwargs={'pk': job.pk}))
+        self.assertEqual(job.status, ImportJob.Status.PENDING)
+        self.assertEqual(len(Transaction.objects.all()), 0)
+
+    def test_worker_imports_uploaded_file(self) -> None:
+        post_data = {'file': open_test_file('single_dummy.csv')}
+        request = self.factory.post(reverse('transactions:upload'), data=post_data)
+        request.user = self.user
+        UploadTransactionsFormView.as_view()(request)
+
+        jobs = run_pending_jobs()
+
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(jobs[0].status, ImportJob.Status.DONE)
+        self.assertEqual(jobs[0].amount_success, 1)
+        self.assertEqual(len(Transaction.objects.filter(user=self.user)), 1)
+
+    def test_identical_upload_reuses_earlier_import(self) -> None:
+        for _ in range(2):
+            post_data = {'file': open_test_file('single_dummy.csv')}
+            request = self.factory.post(reverse('transactions:upload'), data=post_data)
+            request.user = self.user
+            UploadTransactionsFormView.as_view()(request)
+            run_pending_jobs()
+
+        first, second = ImportJob.objects.order_by('pk')
+        self.assertEqual(second.status, ImportJob.Status.DONE)
+        self.assertEqual(second.identical_to, first)
+        self.assertEqual(second.amount_success, 1)
+        self.assertEqual(second.row_count, 1)
+        self.assertFalse(second.file)
+
+    def test_imports_several_files_of_different_accounts(self) -> None:
+        files = [
+            SimpleUploadedFile(
+                f'{account_number}.csv',
+                ''.join(generate_test_file(20, account_number, other_parties=5)).encode('latin1'),
+            )
+            for account_number in ('NL11RABO0104955555', 'NL22RABO0104966666')
+        ]
+        request = self.factory.post(reverse('transactions:upload'), data={'file': files})
+        request.user = self.user
+        UploadTransactionsFormView.as_view()(request)
+
+        job, = run_pending_jobs()
+
+        self.assertEqual(job.status, ImportJob.Status.DONE)
+        self.assertEqual(job.row_count, 40)
+        self.assertEqual(job.amount_success, 40)
+        self.assertEqual(len(Account.objects.filter(name__startswith='Party')), 5)
+
+    def test_imports_zip_archive(self) -> None:
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zip_file:
+            zip_file.writestr('export.csv', ''.join(generate_test_file(10)))
+            zip_file.writestr('readme.txt', 'Not a transaction')
+        post_data = {'file': SimpleUploadedFile('exports.zip', archive.getvalue())}
+        request = self.factory.post(reverse('transactions:upload'), data=post_data)
+        request.user = self.user
+        UploadTransactionsFormView.as_view()(request)
+
+        job, = run_pending_jobs()
+
+        self.assertEqual(job.status, ImportJob.Status.DONE)
+        self.assertEqual(job.row_count, 10)
+        self.assertEqual(len(Transaction.objects.filter(user=self.user)), 10)
+
+    def test_refuses_archive_with_too_many_or_too_large_files(self) -> None:
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr('a.csv', ''.join(generate_test_file(10)))
+            zip_file.writestr('b.csv', ''.join(generate_test_file(10)))
+
+        for limits, message in [
+            ({'IMPORT_MAX_FILES': 1}, 'Upload at most 1 CSV files at once'),
+            ({'IMPORT_MAX_FILE_SIZE': 100}, 'a.csv is larger than 100\xa0bytes'),
+        ]:
+            post_data = {'file': SimpleUploadedFile('exports.zip', archive.getvalue())}
+            request = self.factory.post(reverse('transactions:upload'), data=post_data)
+            request.user = self.user
+            with self.settings(**limits):
+                response = UploadTransactionsFormView.as_view()(request)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, message)
+        self.assertFalse(ImportJob.objects.exists())
 
     def test_returns_when_file_is_faulty(self) -> None:
         post_data = {'file': open_test_file('data.rtf')} 
@@ -103,6 +395,50 @@ class UploadTransactionsFormViewTestCase(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, '/accounts/login/?next=/transactions/upload/')
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImportJobStatusViewTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = UserFactory()
+        self.factory = RequestFactory()
+
+    def test_reports_progress_of_job(self) -> None:
+        job = ImportJob.objects.create(
+            user=self.user,
+            status=ImportJob.Status.RUNNING,
+            amount_processed=1000,
+            amount_success=990,
+            amount_duplicate=10,
+        )
+        request = self.factory.get(reverse('transactions:import-job-status', kwargs={'pk': job.pk}))
+        request.user = self.user
+
+        response = ImportJobStatusView.as_view()(request, pk=job.pk)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(
+            response.content,
+            {
+                'id': job.pk,
+                'status': 'running',
+                'processed': 1000,
+                'success': 990,
+                'duplicate': 10,
+                'failed': 0,
+                'error': '',
+                'identical_to': None,
+            },
+        )
+
+    def test_hides_jobs_of_other_users(self) -> None:
+        job = ImportJob.objects.create(user=UserFactory())
+        client = Client()
+        client.force_login(self.user)
+
+        response = client.get(reverse('transactions:import-job-status', kwargs={'pk': job.pk}))
+
+        self.assertEqual(response.status_code, 404)
+
+
 class UploadTransactionsAnonymousFormViewTestCase(TestCase):
     def setUp(self) -> None:
         self.factory = RequestFactory()
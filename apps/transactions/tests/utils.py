@@ -1,13 +1,35 @@
 from os import path
-from typing import TextIO
+from typing import Iterator, TextIO
 
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+HEADERS = (
+    '"IBAN/BBAN","Munt","BIC","Volgnr","Datum","Rentedatum","Bedrag","Saldo na trn",'
+    '"Tegenrekening IBAN/BBAN","Naam tegenpartij","Naam uiteindelijke partij",'
+    '"Naam initiërende partij","BIC tegenpartij","Code","Batch ID","Transactiereferentie",'
+    '"Machtigingskenmerk","Incassant ID","Betalingskenmerk","Omschrijving-1","Omschrijving-2",'
+    '"Omschrijving-3","Reden retour","Oorspr bedrag","Oorspr munt","Koers"\n'
+)
+
 
 def open_test_file(file_name: str) -> TextIO:
     current_dir = path.dirname(__file__)
     fixture_dir = path.join(current_dir, 'data')
     file_path = path.join(fixture_dir, file_name)
     return open(file_path, 'r')
+
+
+def generate_test_file(
+    amount: int, account_number: str = "NL11RABO0104955555", other_parties: int = 50
+) -> Iterator[str]:
+    """Lines of a Rabobank export that never exists in memory as a whole"""
+    yield HEADERS
+    for i in range(amount):
+        yield (
+            f'"{account_number}","EUR","RABONL2U","{i:018}","2019-09-{i % 28 + 1:02}",'
+            f'"2019-09-01","-{i % 500 + 1},50","+1868,12","NL42RABO{i % other_parties:010}",'
+            f'"Party {i % other_parties}","","","RABONL2U","cb","","","","","",'
+            f'"Payment {i}","","","","","",""\n'
+        )
@@ -0,0 +1,83 @@
+from datetime import date
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from apps.transactions.tests.factories import TransactionFactory, UserFactory
+from apps.transactions.tests.utils import generate_test_file
+from apps.transactions.utils.cache import (
+    bump_data_version,
+    get_cached_dashboard,
+    get_data_version,
+    version_key_of,
+)
+from apps.transactions.utils.fileparser import BulkModelStorageHandler, FileParser
+
+if TYPE_CHECKING:
+    from apps.accounts.models import User
+else:
+    User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+MONTH = date(2019, 9, 1)
+
+
+@pytest.fixture
+def user() -> User:
+    return UserFactory()
+
+
+def test_repeated_dashboards_come_from_the_cache(
+    user: User, django_assert_num_queries: Any
+) -> None:
+    TransactionFactory(user=user, date=MONTH, amount=Decimal("-5"))
+    expected = get_cached_dashboard(MONTH, user)
+
+    with django_assert_num_queries(0):
+        dashboard = get_cached_dashboard(MONTH, user)
+
+    assert dashboard == expected
+
+
+def test_import_invalidates_the_dashboard(
+    user: User, django_capture_on_commit_callbacks: Any
+) -> None:
+    assert get_cached_dashboard(MONTH, user)["expenses"] is None
+    version = get_data_version(user)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        FileParser(BulkModelStorageHandler(user)).parse(generate_test_file(3))
+
+    assert get_data_version(user) != version
+    assert get_cached_dashboard(MONTH, user)["expenses"] == Decimal("-7.50")
+
+
+def test_saved_transactions_invalidate_the_dashboard(
+    user: User, django_capture_on_commit_callbacks: Any
+) -> None:
+    get_cached_dashboard(MONTH, user)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        TransactionFactory(user=user, date=MONTH, amount=Decimal("-5"))
+
+    assert get_cached_dashboard(MONTH, user)["expenses"] == Decimal("-5")
+
+
+def test_bumped_version_reaches_other_processes(
+    user: User, django_capture_on_commit_callbacks: Any
+) -> None:
+    # A cache per process would pass the second check, as its instances share their storage
+    assert not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+    web_cache = caches.create_connection(DEFAULT_CACHE_ALIAS)
+    version = get_data_version(user)
+    assert web_cache.get(version_key_of(user.pk)) == version
+
+    with django_capture_on_commit_callbacks(execute=True):
+        bump_data_version(user.pk)
+
+    assert web_cache.get(version_key_of(user.pk)) not in (None, version)
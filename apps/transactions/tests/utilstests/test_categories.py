@@ -0,0 +1,112 @@
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from apps.transactions.models import Rule, Transaction
+from apps.transactions.tests.factories import (
+    CategoryFactory,
+    OtherPartyFactory,
+    RuleFactory,
+    TransactionFactory,
+    UserFactory,
+)
+from apps.transactions.tests.utils import generate_test_file
+from apps.transactions.utils.categories import CategoryMatcher
+from apps.transactions.utils.fileparser import (
+    BulkModelStorageHandler,
+    FileParser,
+    ModelStorageHandler,
+)
+
+if TYPE_CHECKING:
+    from apps.accounts.models import User
+else:
+    User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def user() -> User:
+    return UserFactory()
+
+
+def test_matches_account_numbers_before_names_before_memos(user: User) -> None:
+    rent = RuleFactory(user=user, field=Rule.Field.MEMO, pattern="Huur").category
+    groceries = RuleFactory(user=user, field=Rule.Field.OTHER_PARTY_NAME, pattern="Jumbo").category
+    savings = RuleFactory(
+        user=user, field=Rule.Field.OTHER_PARTY_ACCOUNT_NUMBER, pattern="NL42RABO0000000001"
+    ).category
+    matcher = CategoryMatcher.for_user(user)
+
+    assert matcher.match("NL42RABO0000000001", "JUMBO 123", "huur") == savings.pk
+    assert matcher.match("NL42RABO0000000002", "JUMBO 123", "huur") == groceries.pk
+    assert matcher.match("NL42RABO0000000002", "Woonstichting", "Huur juni") == rent.pk
+    assert matcher.match("NL42RABO0000000002", "Woonstichting", None) is None
+
+
+def test_first_pattern_in_text_wins_and_then_oldest_rule(user: User) -> None:
+    albert = RuleFactory(user=user, field=Rule.Field.MEMO, pattern="albert").category
+    heijn = RuleFactory(user=user, field=Rule.Field.MEMO, pattern="heijn").category
+    RuleFactory(user=user, field=Rule.Field.MEMO, pattern="albert heijn")
+    matcher = CategoryMatcher.for_user(user)
+
+    assert matcher.match("", "", "Betaling Albert Heijn 1234") == albert.pk
+    assert matcher.match("", "", "Heijn, Albert") == heijn.pk
+
+
+def test_handles_thousands_of_rules(user: User) -> None:
+    category = CategoryFactory(user=user)
+    rules = [
+        Rule(pk=i, field=Rule.Field.MEMO, pattern=f"merchant {i:05}", category=category)
+        for i in range(5000)
+    ]
+    matcher = CategoryMatcher(rules)
+
+    assert matcher.match("", "", "Pinbetaling MERCHANT 04999 Utrecht") == category.pk
+    assert matcher.match("", "", "Pinbetaling merchant 5000") is None
+
+
+@pytest.mark.parametrize("storage", [ModelStorageHandler, BulkModelStorageHandler])
+def test_categorizes_imported_transactions(user: User, storage: Any) -> None:
+    party = RuleFactory(user=user, field=Rule.Field.OTHER_PARTY_NAME, pattern="Party 1").category
+    payment = RuleFactory(user=user, field=Rule.Field.MEMO, pattern="Payment 2").category
+
+    FileParser(storage(user), batch_size=4).parse(generate_test_file(10, other_parties=3))
+
+    categories = dict(Transaction.objects.values_list("memo", "category"))
+    assert categories["Payment 1"] == party.pk
+    assert categories["Payment 2"] == payment.pk
+    assert categories["Payment 0"] is None
+
+
+def test_recategorizes_existing_transactions(user: User) -> None:
+    shop = OtherPartyFactory(user=user, name="Hema")
+    transactions = [TransactionFactory(user=user, other_party=shop) for _ in range(5)]
+    other = TransactionFactory(user=user)
+    category = RuleFactory(user=user, field=Rule.Field.OTHER_PARTY_NAME, pattern="hema").category
+
+    call_command("recategorize", f"--user={user.username}", "--chunk-size=2")
+
+    assert {t.pk for t in Transaction.objects.filter(category=category)} == {
+        t.pk for t in transactions
+    }
+    assert Transaction.objects.get(pk=other.pk).category is None
+
+
+def test_matches_account_numbers_however_they_are_written(user: User) -> None:
+    shop = OtherPartyFactory(user=user, account_number="NL42RABO0000000001")
+    transaction = TransactionFactory(user=user, other_party=shop)
+    category = RuleFactory(
+        user=user, field=Rule.Field.OTHER_PARTY_ACCOUNT_NUMBER, pattern=" nl42 rabo 0000 0000 01"
+    ).category
+
+    call_command("recategorize", f"--user={user.username}")
+    FileParser(BulkModelStorageHandler(user)).parse(
+        generate_test_file(2, account_number="NL11RABO0104955555", other_parties=2)
+    )
+
+    assert Transaction.objects.get(pk=transaction.pk).category == category
+    assert Transaction.objects.get(memo="Payment 1").category == category
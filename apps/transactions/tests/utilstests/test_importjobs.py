@@ -0,0 +1,108 @@
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+
+from apps.transactions.models import ImportJob, Transaction
+from apps.transactions.tests.factories import UserFactory
+from apps.transactions.tests.utils import generate_test_file
+from apps.transactions.utils.importjobs import (
+    claim_next_job,
+    requeue_stale_jobs,
+    run_import_job,
+)
+
+if TYPE_CHECKING:
+    from apps.accounts.models import User
+else:
+    User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def user(settings: Any, tmp_path: Any) -> User:
+    settings.MEDIA_ROOT = str(tmp_path)
+    return UserFactory()
+
+
+def create_job(user: User, content: str) -> ImportJob:
+    return ImportJob.objects.create(
+        user=user, file=ContentFile(content.encode("latin1"), name="export.csv")
+    )
+
+
+def test_claims_every_job_once(user: User) -> None:
+    first = create_job(user, "")
+    second = create_job(user, "")
+
+    assert claim_next_job() == first
+    assert claim_next_job() == second
+    assert claim_next_job() is None
+    assert ImportJob.objects.get(pk=first.pk).status == ImportJob.Status.RUNNING
+
+
+def test_saves_progress_and_result_of_job(user: User) -> None:
+    job = create_job(user, "".join(generate_test_file(2500)))
+
+    job = run_import_job(claim_next_job())
+
+    assert job.status == ImportJob.Status.DONE
+    assert job.amount_processed == 2500
+    assert job.amount_success == 2500
+    assert job.finished_at is not None
+    assert not job.file
+    assert len(Transaction.objects.filter(user=user)) == 2500
+
+
+def test_marks_job_as_failed(user: User) -> None:
+    create_job(user, '"IBAN/BBAN","Volgnr"\n"NL11RABO0104955555","1"\n')
+
+    job = run_import_job(claim_next_job())
+
+    assert job.status == ImportJob.Status.FAILED
+    assert job.error != ""
+
+
+def test_requeues_only_jobs_without_recent_progress(user: User) -> None:
+    stale, busy = create_job(user, ""), create_job(user, "")
+    claim_next_job()
+    claim_next_job()
+    ImportJob.objects.filter(pk=stale.pk).update(
+        heartbeat_at=timezone.now() - timedelta(minutes=20)
+    )
+
+    assert requeue_stale_jobs(stale_after=timedelta(minutes=15)) == 1
+    assert ImportJob.objects.get(pk=stale.pk).status == ImportJob.Status.PENDING
+    assert ImportJob.objects.get(pk=busy.pk).status == ImportJob.Status.RUNNING
+
+
+def test_saves_heartbeat_with_progress(user: User) -> None:
+    create_job(user, "".join(generate_test_file(3)))
+    job = claim_next_job()
+    claimed_at = job.heartbeat_at
+
+    job = run_import_job(job)
+
+    assert job.heartbeat_at > claimed_at
+
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_command_processes_pending_jobs(user: User) -> None:
+    create_job(user, "".join(generate_test_file(3)))
+
+    call_command("process_imports", "--once", "--workers=1", "--interval=0.01")
+
+    assert ImportJob.objects.get().status == ImportJob.Status.DONE
+    assert len(Transaction.objects.filter(user=user)) == 3
+
+
+def test_worker_command_refuses_a_cache_per_process(user: User, settings: Any) -> None:
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+    with pytest.raises(CommandError):
+        call_command("process_imports", "--once")
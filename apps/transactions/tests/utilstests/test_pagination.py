@@ -0,0 +1,68 @@
+from datetime import date
+from typing import TYPE_CHECKING, Any, List
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.http import Http404
+
+from apps.transactions.models import Transaction
+from apps.transactions.tests.factories import TransactionFactory, UserFactory
+from apps.transactions.utils.pagination import KeysetPaginator, decode_cursor
+
+if TYPE_CHECKING:
+    from apps.accounts.models import User
+else:
+    User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def user() -> User:
+    user = UserFactory()
+    # Several transactions a day, so the id decides the order within a day
+    for i in range(11):
+        TransactionFactory(user=user, date=date(2021, 6, 1 + i // 3))
+    return user
+
+
+def newest_first(user: User) -> List[Any]:
+    return list(Transaction.objects.filter(user=user).order_by("-date", "-pk"))
+
+
+def test_pages_forward_and_back_in_a_stable_order(user: User) -> None:
+    paginator = KeysetPaginator(Transaction.objects.filter(user=user), per_page=4)
+
+    first = paginator.page()
+    second = paginator.page(first.next_cursor)
+    third = paginator.page(second.next_cursor)
+    back = paginator.page(third.previous_cursor)
+
+    assert first.object_list + second.object_list + third.object_list == newest_first(user)
+    assert not first.has_previous() and not third.has_next()
+    assert back.object_list == second.object_list
+    assert paginator.page(back.previous_cursor).object_list == first.object_list
+
+
+def test_last_page_has_the_oldest_transactions(user: User) -> None:
+    paginator = KeysetPaginator(Transaction.objects.filter(user=user), per_page=4)
+
+    last = paginator.page(paginator.last_cursor())
+
+    assert last.object_list == newest_first(user)[-4:]
+    assert not last.has_next()
+    assert paginator.page(last.previous_cursor).object_list == newest_first(user)[3:7]
+
+
+def test_counts_only_when_asked(user: User, django_assert_num_queries: Any) -> None:
+    with django_assert_num_queries(1):
+        page = KeysetPaginator(Transaction.objects.filter(user=user), per_page=4).page()
+
+    assert page.count is None
+    assert KeysetPaginator(Transaction.objects.all(), per_page=4, count=True).page().count == 11
+
+
+@pytest.mark.parametrize("cursor", ["", "bm90LWEtY3Vyc29y", "!!", "eDIwMjEtMDYtMDEuMQ"])
+def test_rejects_invalid_cursors(cursor: str) -> None:
+    with pytest.raises(Http404):
+        decode_cursor(cursor)
@@ -0,0 +1,155 @@
+from datetime import date
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, List
+
+import pytest
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+
+from apps.transactions.models import Account, ImportJob, Recurrence
+from apps.transactions.tests.factories import OtherPartyFactory, TransactionFactory, UserFactory
+from apps.transactions.tests.utils import HEADERS
+from apps.transactions.utils.importjobs import claim_next_job, run_import_job
+from apps.transactions.utils.recurrences import refresh_recurrences
+
+if TYPE_CHECKING:
+    from apps.accounts.models import User
+else:
+    User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+START = date(2021, 1, 15)
+
+
+@pytest.fixture
+def user() -> User:
+    return UserFactory()
+
+
+def create_payments(
+    user: User, other_party: Account, days: List[int], amounts: List[str]
+) -> None:
+    for i, (day, amount) in enumerate(zip(days, amounts)):
+        TransactionFactory(
+            user=user,
+            other_party=other_party,
+            code=f"{other_party.pk}-{i}",
+            date=START + relativedelta(days=day),
+            amount=Decimal(amount),
+        )
+
+
+def test_finds_monthly_subscription(user: User) -> None:
+    streaming = OtherPartyFactory(user=user)
+    create_payments(user, streaming, [0, 31, 59, 90, 120], ["-12.99"] * 5)
+
+    found = refresh_recurrences(user)
+
+    assert len(found) == 1
+    recurrence = Recurrence.objects.get(user=user)
+    assert recurrence.other_party == streaming
+    assert recurrence.period == Recurrence.Period.MONTHLY
+    assert recurrence.amount == Decimal("-12.99")
+    assert recurrence.occurrences == 5
+    assert recurrence.first_date == START
+    assert recurrence.last_date == date(2021, 5, 15)
+    assert recurrence.next_date == date(2021, 6, 15)
+
+
+def test_finds_weekly_and_yearly_payments_next_to_each_other(user: User) -> None:
+    cleaner = OtherPartyFactory(user=user)
+    insurance = OtherPartyFactory(user=user)
+    create_payments(
+        user, cleaner, [0, 7, 14, 21, 28, 35], ["-40", "-40", "-45", "-40", "-40", "-40"]
+    )
+    create_payments(user, insurance, [0, 365, 730], ["-300", "-310", "-320"])
+
+    refresh_recurrences(user)
+
+    periods = dict(Recurrence.objects.values_list("other_party", "period"))
+    assert periods == {
+        cleaner.pk: Recurrence.Period.WEEKLY,
+        insurance.pk: Recurrence.Period.YEARLY,
+    }
+
+
+@pytest.mark.parametrize(
+    "days,amounts",
+    [
+        ([0, 3, 40, 41, 120], ["-10"] * 5),
+        ([0, 30, 61, 91, 122], ["-10", "-80", "-5", "-150", "-30"]),
+        ([0, 30], ["-10", "-10"]),
+    ],
+    ids=["irregular intervals", "unstable amounts", "too few payments"],
+)
+def test_ignores_payments_that_do_not_recur(
+    user: User, days: List[int], amounts: List[str]
+) -> None:
+    create_payments(user, OtherPartyFactory(user=user), days, amounts)
+
+    assert refresh_recurrences(user) == []
+    assert not Recurrence.objects.filter(user=user).exists()
+
+
+def test_ignores_incomes_and_other_users(user: User) -> None:
+    create_payments(user, OtherPartyFactory(user=user), [0, 31, 59, 90], ["2500"] * 4)
+    other = UserFactory()
+    create_payments(other, OtherPartyFactory(user=other), [0, 31, 59, 90], ["-10"] * 4)
+
+    assert refresh_recurrences(user) == []
+    assert Recurrence.objects.filter(user=other).count() == 0
+
+
+def test_refreshes_only_the_given_counterparties(user: User) -> None:
+    gym = OtherPartyFactory(user=user)
+    phone = OtherPartyFactory(user=user)
+    create_payments(user, gym, [0, 31, 59, 90], ["-25"] * 4)
+    create_payments(user, phone, [0, 31, 59, 90], ["-15"] * 4)
+    refresh_recurrences(user)
+    create_payments(user, phone, [120, 151], ["-15", "-15"])
+    phone_recurrence = Recurrence.objects.get(other_party=phone)
+    phone_recurrence.occurrences = 99
+    phone_recurrence.save()
+
+    refresh_recurrences(user, [gym.pk])
+
+    assert Recurrence.objects.get(other_party=gym).occurrences == 4
+    assert Recurrence.objects.get(other_party=phone).occurrences == 99
+
+
+def payment_line(i: int, day: date, name: str, amount: str) -> str:
+    return (
+        f'"NL11RABO0104955555","EUR","RABONL2U","{i:018}","{day.isoformat()}",'
+        f'"{day.isoformat()}","{amount}","+1868,12","NL42RABO0000000777",'
+        f'"{name}","","","RABONL2U","cb","","","","","",'
+        f'"Abonnement {i}","","","","","",""\n'
+    )
+
+
+def test_import_job_refreshes_recurrences(user: User, settings: Any, tmp_path: Any) -> None:
+    settings.MEDIA_ROOT = str(tmp_path)
+    lines = [
+        payment_line(i, START + relativedelta(months=i), "Streamingdienst", "-12,99")
+        for i in range(4)
+    ]
+    ImportJob.objects.create(
+        user=user, file=ContentFile((HEADERS + "".join(lines)).encode("latin1"), name="export.csv")
+    )
+
+    job = run_import_job(claim_next_job())
+
+    assert job.status == ImportJob.Status.DONE
+    recurrence = Recurrence.objects.get(user=user)
+    assert recurrence.other_party.name == "Streamingdienst"
+    assert recurrence.occurrences == 4
+
+
+def test_command_detects_recurrences_of_existing_history(user: User) -> None:
+    create_payments(user, OtherPartyFactory(user=user), [0, 91, 182, 273], ["-60"] * 4)
+
+    call_command("detect_recurrences", "--user", user.username)
+
+    assert Recurrence.objects.get(user=user).period == Recurrence.Period.QUARTERLY
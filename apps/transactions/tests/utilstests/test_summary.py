@@ -1,3 +1,4 @@
+from datetime import date
 from decimal import Decimal
 
 from apps.transactions.tests.factories import (
@@ -23,3 +24,40 @@ def test_summary_create_flow_graph() -> None:
         "nodes": [{"name": "Betaalrekening"}, {"name": "Hema"}],
         "links": [{"source": "Hema", "target": "Betaalrekening", "value": Decimal(150)}],
     }
+
+
+def test_summary_aggregates_in_one_pass() -> None:
+    shopping = OtherPartyFactory.build(name="Hema")
+    savings = ReceiverFactory.build(name="Spaarrekening")
+    checkings = ReceiverFactory.build(name="Betaalrekening")
+    transactions = [
+        TransactionFactory.build(
+            receiver=checkings, other_party=shopping, amount=Decimal(-100), date=date(2021, 6, 3)
+        ),
+        TransactionFactory.build(
+            receiver=checkings, other_party=shopping, amount=Decimal(250), date=date(2021, 6, 1)
+        ),
+        TransactionFactory.build(
+            receiver=checkings, other_party=savings, amount=Decimal(-50), date=date(2021, 6, 9)
+        ),
+        TransactionFactory.build(
+            receiver=savings, other_party=checkings, amount=Decimal(50), date=date(2021, 6, 9)
+        ),
+    ]
+
+    summary = Summary(transactions)
+
+    assert (summary.date_first, summary.date_last) == (date(2021, 6, 1), date(2021, 6, 9))
+    assert summary.expenses_to_outside == Decimal(-100)
+    assert summary.incomes_from_outside == Decimal(250)
+    assert summary.total_balance == Decimal(150)
+    assert summary.receivers == [checkings, savings]
+    assert summary.amount_of_receivers == 2
+
+
+def test_summary_of_nothing() -> None:
+    summary = Summary([])
+
+    assert summary.date_first is None
+    assert summary.total_balance == Decimal(0)
+    assert summary.amount_of_receivers == 0
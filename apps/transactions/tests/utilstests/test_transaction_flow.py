@@ -1,11 +1,17 @@
 from decimal import Decimal
+from typing import List, Tuple
+
+import pytest
+from networkx import DiGraph, simple_cycles
 
 from apps.transactions.tests.factories import (
     OtherPartyFactory,
     ReceiverFactory,
     TransactionFactory,
 )
+from apps.transactions.tests.utils import generate_test_file, open_test_file
 from apps.transactions.utils import transaction_flow
+from apps.transactions.utils.fileparser import AnonymousStorageHandler, FileParser
 from apps.transactions.utils.transaction_flow import TransactionLink, TransactionNode
 
 
@@ -117,6 +123,23 @@ def test_summary_flow_link_same_source_target_flip_source_target_when_negative_n
     assert links == [TransactionLink("Hema", "Betaalrekening", Decimal(150), False)]
 
 
+def test_summary_flow_link_keeps_flipped_direction_when_values_cancel_out() -> None:
+    """A link only flips when the value drops below zero, not when it gets back to zero"""
+    shopping = OtherPartyFactory.build(name="Hema")
+    checkings = ReceiverFactory.build(name="Betaalrekening")
+    transactions = [
+        TransactionFactory.build(receiver=checkings, other_party=shopping, amount=Decimal(-100)),
+        TransactionFactory.build(receiver=checkings, other_party=shopping, amount=Decimal(250)),
+        TransactionFactory.build(receiver=checkings, other_party=shopping, amount=Decimal(-150)),
+    ]
+
+    links = transaction_flow.create_links_from(
+        transactions, transaction_flow.create_nodes_from(transactions)
+    )
+
+    assert links == [TransactionLink("Hema", "Betaalrekening", Decimal(0), False)]
+
+
 def test_summary_creates_flow_links_multiple() -> None:
     """To see where the moneys go"""
     checkings = ReceiverFactory.build(name="Eigen rekening", account_number="NL11RABO1")
@@ -235,3 +258,88 @@ def test_summary_cyclic_graph() -> None:
         #     },
         # ]
     }
+
+
+def links_in_cycles(links: List[TransactionLink]) -> List[TransactionLink]:
+    """The loop links as found before, by listing every cycle"""
+    dg = DiGraph()
+    for link in links:
+        dg.add_edge(link.source, link.target)
+
+    loop_links = []
+    for cycle in simple_cycles(dg):
+        for link in links:
+            if link.source in cycle and link.target in cycle and link.is_target_external:
+                if link not in loop_links:
+                    loop_links.append(link)
+    return loop_links
+
+
+def nodes_of(link: TransactionLink) -> Tuple[str, str]:
+    return link.source, link.target
+
+
+@pytest.mark.parametrize(
+    "file_name",
+    [
+        "duplicate_account.csv",
+        "duplicate_transaction.csv",
+        "is_user_owner_switch.csv",
+        "non_user_account.csv",
+        "other_parties_no_account_number.csv",
+        "single_dummy.csv",
+    ],
+)
+def test_loop_links_are_the_same_as_in_cycles_for_fixtures(file_name: str) -> None:
+    result = FileParser(AnonymousStorageHandler()).parse(open_test_file(file_name))
+    transactions = result.transactions
+    links = transaction_flow.create_links_from(
+        transactions, transaction_flow.create_nodes_from(transactions)
+    )
+
+    loop_links = transaction_flow.get_links_that_cause_loops(links)
+
+    assert sorted(loop_links, key=nodes_of) == sorted(links_in_cycles(links), key=nodes_of)
+
+
+def test_loop_links_are_the_same_as_in_cycles_for_cyclic_links() -> None:
+    links = [
+        TransactionLink("Betaalverzoek", "Own account", Decimal(8), False),
+        TransactionLink("T.M. Hermans", "AH", Decimal(41), True),
+        TransactionLink("Own account", "T.M. Hermans", Decimal(200), False),
+        TransactionLink("T.M. Hermans", "Betaalverzoek", Decimal(8), True),
+        TransactionLink("AH", "AH", Decimal(1), True),
+        TransactionLink("Savings", "Own account", Decimal(5), False),
+    ]
+
+    loop_links = transaction_flow.get_links_that_cause_loops(links)
+
+    assert sorted(loop_links, key=nodes_of) == sorted(links_in_cycles(links), key=nodes_of)
+    assert loop_links == [links[3], links[4]]
+
+
+def test_loop_links_of_many_transfers_between_own_accounts() -> None:
+    """Every pair of savings accounts has a loop, far too many cycles to list them all"""
+    own = [f"Savings {i}" for i in range(30)]
+    links = [
+        TransactionLink(source, target, Decimal(1), False)
+        for i, source in enumerate(own)
+        for target in own[i + 1 :]
+    ]
+    links += [
+        TransactionLink(target, source, Decimal(1), True) for source, target in zip(own, own[1:])
+    ]
+    links.append(TransactionLink(own[0], "Hema", Decimal(1), True))
+
+    loop_links = transaction_flow.get_links_that_cause_loops(links)
+
+    assert len(loop_links) == len(own) - 1
+    assert all(link.target != "Hema" for link in loop_links)
+
+
+def test_flow_of_generated_file_has_no_external_loop_links() -> None:
+    result = FileParser(AnonymousStorageHandler()).parse(generate_test_file(500))
+
+    graph = transaction_flow.create_flow_for(result.transactions)
+
+    assert len(graph["links"]) == 50
@@ -4,6 +4,12 @@ from apps.transactions import views
 app_name="transactions"
 urlpatterns = [
 	path('', views.TransactionListView.as_view(), name="index"),
+	path('year/', views.YearOverviewView.as_view(), name="year"),
+	path('export.<str:export_format>', views.TransactionExportView.as_view(), name="export"),
+	path('search/', views.TransactionSearchView.as_view(), name="search"),
+	path('recurring/', views.RecurrenceListView.as_view(), name="recurrences"),
 	path('upload/', views.UploadTransactionsFormView.as_view(), name="upload"),
-	path('upload-anonymous', views.UploadAnonymousTransactionsFormView.as_view(), name="upload-anonymous")
+	path('upload-anonymous', views.UploadAnonymousTransactionsFormView.as_view(), name="upload-anonymous"),
+	path('imports/<int:pk>/', views.ImportJobDetailView.as_view(), name="import-job"),
+	path('imports/<int:pk>/status', views.ImportJobStatusView.as_view(), name="import-job-status"),
 ]
\ No newline at end of file
@@ -0,0 +1,41 @@
+from datetime import date
+from typing import TYPE_CHECKING, Any, Dict
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+
+from apps.transactions.models import Transaction
+
+if TYPE_CHECKING:
+    from apps.accounts.models import User as UserType
+else:
+    UserType = get_user_model()
+
+
+def get_cached_dashboard(month: date, user: UserType) -> Dict[str, Any]:
+    """The dashboard of a month, computed once per version of the user's transactions.
+    The version is read before the transactions, so a dashboard is never stored under a
+    version that is newer than its data."""
+    key = f"transactions:dashboard:{user.pk}:{month:%Y-%m}:{get_data_version(user)}"
+    return cache.get_or_set(
+        key,
+        lambda: Transaction.statistics.get_dashboard(month, user),
+        settings.DASHBOARD_CACHE_TIMEOUT,
+    )
+
+
+def get_data_version(user: UserType) -> str:
+    # A random version, so one that was evicted from the cache can never come back
+    return cache.get_or_set(version_key_of(user.pk), lambda: uuid4().hex, None)
+
+
+def bump_data_version(user_id: int) -> None:
+    """Gives the user's transactions a new version once the running transaction commits"""
+    db_transaction.on_commit(lambda: cache.set(version_key_of(user_id), uuid4().hex, None))
+
+
+def version_key_of(user_id: int) -> str:
+    return f"transactions:version:{user_id}"
@@ -0,0 +1,110 @@
+import re
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Pattern
+
+from django.contrib.auth import get_user_model
+
+from apps.transactions.models import Rule, Transaction, account_number_key_of
+
+if TYPE_CHECKING:
+    from apps.accounts.models import User as UserType
+else:
+    UserType = get_user_model()
+
+
+class CategoryMatcher:
+    """All rules of a user compiled into one lookup per field, so a transaction is matched
+    against thousands of rules with a dict lookup and two regex scans.
+
+    Account numbers have to be equal, compared by their keys (see `account_number_key_of`),
+    names and memos have to contain the pattern (ignoring case). An account number rule goes
+    before a name rule, which goes before a memo rule.
+    Within a field the pattern found first in the text wins, and of the patterns found at the
+    same place the one of the oldest rule.
+    """
+
+    def __init__(self, rules: Iterable[Rule]) -> None:
+        self.by_account_number: Dict[str, int] = {}
+        substrings: Dict[str, Dict[str, int]] = {
+            Rule.Field.OTHER_PARTY_NAME: {},
+            Rule.Field.MEMO: {},
+        }
+        for rule in sorted(rules, key=lambda rule: rule.pk):
+            if rule.field == Rule.Field.OTHER_PARTY_ACCOUNT_NUMBER:
+                self.by_account_number.setdefault(
+                    account_number_key_of(rule.pattern), rule.category_id
+                )
+            elif rule.pattern:
+                substrings[rule.field].setdefault(rule.pattern.lower(), rule.category_id)
+
+        self.by_name = substrings[Rule.Field.OTHER_PARTY_NAME]
+        self.by_memo = substrings[Rule.Field.MEMO]
+        self.name_pattern = compile_alternation(self.by_name)
+        self.memo_pattern = compile_alternation(self.by_memo)
+
+    @classmethod
+    def for_user(cls, user: UserType) -> "CategoryMatcher":
+        return cls(Rule.objects.filter(user=user).only("pk", "field", "pattern", "category"))
+
+    def __bool__(self) -> bool:
+        return bool(self.by_account_number or self.by_name or self.by_memo)
+
+    def match(self, account_number_key: str, name: str, memo: Optional[str]) -> Optional[int]:
+        """The id of the category of a transaction with these fields"""
+        if account_number_key in self.by_account_number:
+            return self.by_account_number[account_number_key]
+        return search(self.name_pattern, self.by_name, name) or search(
+            self.memo_pattern, self.by_memo, memo
+        )
+
+    def categorize(self, transactions: List[Transaction]) -> None:
+        """Sets the category of a batch of transactions whose counterparty is loaded"""
+        for transaction in transactions:
+            transaction.category_id = self.match(
+                account_number_key_of(transaction.other_party.account_number),
+                transaction.other_party.name,
+                transaction.memo,
+            )
+
+
+def compile_alternation(patterns: Dict[str, int]) -> Optional[Pattern[str]]:
+    if not patterns:
+        return None
+    return re.compile("|".join(re.escape(pattern) for pattern in patterns))
+
+
+def search(
+    pattern: Optional[Pattern[str]], categories: Dict[str, int], text: Optional[str]
+) -> Optional[int]:
+    if pattern is None or not text:
+        return None
+    found = pattern.search(text.lower())
+    return categories[found.group()] if found else None
+
+
+def recategorize(user: UserType, chunk_size: int = 2000) -> int:
+    """Applies the current rules of a user to all of their transactions, a chunk at a time.
+
+    Returns:
+        The amount of transactions that got another category
+    """
+    matcher = CategoryMatcher.for_user(user)
+    transactions = Transaction.objects.filter(user=user).order_by("pk")
+    changed = 0
+    last_pk = 0
+    while True:
+        chunk = list(
+            transactions.filter(pk__gt=last_pk).values_list(
+                "pk", "category", "other_party__account_number_key", "other_party__name", "memo"
+            )[:chunk_size]
+        )
+        if not chunk:
+            return changed
+
+        updated = []
+        for pk, category_id, account_number_key, name, memo in chunk:
+            new_category_id = matcher.match(account_number_key, name, memo)
+            if new_category_id != category_id:
+                updated.append(Transaction(pk=pk, category_id=new_category_id))
+        Transaction.objects.bulk_update(updated, ["category"])
+        changed += len(updated)
+        last_pk = chunk[-1][0]
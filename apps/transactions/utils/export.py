@@ -0,0 +1,49 @@
+import csv
+from typing import Any, Iterable, Iterator, Tuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.query import QuerySet
+
+# The exported columns, as header and the lookup they are read with
+COLUMNS = (
+    ("date", "date"),
+    ("amount", "amount"),
+    ("currency", "currency"),
+    ("code", "code"),
+    ("account_number", "receiver__account_number"),
+    ("other_party_account_number", "other_party__account_number"),
+    ("other_party_name", "other_party__name"),
+    ("memo", "memo"),
+    ("category", "category__name"),
+)
+
+
+class Echo:
+    """A file that hands back what is written to it, so `csv.writer` can format single rows"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def export_rows(transactions: QuerySet[Any], chunk_size: int = 2000) -> Iterator[Tuple[Any, ...]]:
+    """Tuples of the exported columns, oldest first. The rows are fetched in chunks with a
+    server-side cursor where the database has them, so no more than a chunk is in memory."""
+    return (
+        transactions.order_by("date", "pk")
+        .values_list(*(lookup for _, lookup in COLUMNS))
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def to_csv(rows: Iterable[Tuple[Any, ...]]) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for header, _ in COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def to_ndjson(rows: Iterable[Tuple[Any, ...]]) -> Iterator[str]:
+    headers = [header for header, _ in COLUMNS]
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(headers, row))) + "\n"
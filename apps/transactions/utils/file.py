@@ -1,9 +1,91 @@
 import csv
-from typing import Any, Dict, Iterator
+import hashlib
+import zipfile
+from io import TextIOWrapper
+from operator import itemgetter
+from typing import Any, BinaryIO, Iterable, Iterator, List, NamedTuple, Tuple
 
 
-def read_raw_transaction_data_from(file: Any) -> Iterator[Dict[str, str]]:
+class RawTransaction(NamedTuple):
+    """The columns of a Rabobank export row that end up in a transaction"""
+
+    account_number: str
+    sequence: str
+    date: str
+    amount: str
+    currency: str
+    other_party_account_number: str
+    other_party_name: str
+    description_1: str
+    description_2: str
+    description_3: str
+
+
+COLUMNS = {
+    "account_number": "IBAN/BBAN",
+    "sequence": "Volgnr",
+    "date": "Datum",
+    "amount": "Bedrag",
+    "currency": "Munt",
+    "other_party_account_number": "Tegenrekening IBAN/BBAN",
+    "other_party_name": "Naam tegenpartij",
+    "description_1": "Omschrijving-1",
+    "description_2": "Omschrijving-2",
+    "description_3": "Omschrijving-3",
+}
+
+
+class MissingColumnsError(ValueError):
+    def __init__(self, missing: List[str]) -> None:
+        super().__init__(f"The file is missing the column(s): {', '.join(missing)}")
+        self.missing = missing
+
+
+def read_raw_transaction_data_from(file: Any) -> Iterator[RawTransaction]:
+    """Reads rows as tuples of only the columns we need.
+    The positions of the columns are looked up once from the header."""
     reader = csv.reader(file, delimiter=",", quotechar='"')
-    header_mapping = {i: header for i, header in enumerate(next(reader))}
+    positions = get_column_positions_from(next(reader, []))
+    project = itemgetter(*positions)
+    width = max(positions) + 1
+    create = RawTransaction._make
+
     for row in reader:
-        yield {header_mapping[row_i]: value for row_i, value in enumerate(row)}
+        if len(row) < width:
+            raise ValueError(
+                f"Row {reader.line_num} has {len(row)} columns, expected at least {width}"
+            )
+        yield create(project(row))
+
+
+def get_column_positions_from(header: List[str]) -> List[int]:
+    positions = {column: i for i, column in enumerate(header)}
+    missing = [column for column in COLUMNS.values() if column not in positions]
+    if missing:
+        raise MissingColumnsError(missing)
+
+    return [positions[COLUMNS[field]] for field in RawTransaction._fields]
+
+
+def fingerprint_of(chunks: Iterable[bytes]) -> Tuple[str, int]:
+    """The SHA-256 of a file and its amount of rows (lines after the header)"""
+    digest = hashlib.sha256()
+    lines = 0
+    last_chunk = b""
+    for chunk in chunks:
+        digest.update(chunk)
+        lines += chunk.count(b"\n")
+        last_chunk = chunk or last_chunk
+
+    if last_chunk and not last_chunk.endswith(b"\n"):
+        lines += 1
+    return digest.hexdigest(), max(lines - 1, 0)
+
+
+def read_archive_rows_from(file: BinaryIO) -> Iterator[RawTransaction]:
+    """Reads the rows of every CSV in a ZIP archive, one member after the other in the order of
+    their names. Only the member that is being read is open, nothing is kept in memory."""
+    with zipfile.ZipFile(file) as archive:
+        for name in sorted(n for n in archive.namelist() if n.lower().endswith(".csv")):
+            with archive.open(name) as member:
+                yield from read_raw_transaction_data_from(TextIOWrapper(member, "latin1"))
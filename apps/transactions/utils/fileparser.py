@@ -1,12 +1,40 @@
+from contextlib import nullcontext
 from datetime import date
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from enum import Enum
-from apps.transactions.models import Account, Transaction
-from typing import Any, Dict, List, Protocol, Optional, TYPE_CHECKING, TextIO
+from itertools import islice
+from apps.transactions.models import (
+    Account,
+    MonthlyTotal,
+    SequenceWatermark,
+    Transaction,
+    account_number_key_of,
+    name_key_of,
+)
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Protocol,
+    Optional,
+    Set,
+    Tuple,
+    TYPE_CHECKING,
+)
 
 from django.contrib.auth import get_user_model
+from django.db import transaction as db_transaction
+from django.db.models import Q
+from django.utils.functional import cached_property
 
-from .file import read_raw_transaction_data_from
+from .cache import bump_data_version
+from .categories import CategoryMatcher
+from .file import RawTransaction, read_raw_transaction_data_from
 
 if TYPE_CHECKING:
     from apps.accounts.models import User as UserType
@@ -28,6 +56,43 @@ class CreationReport:
         self.transactions: List[Transaction] = []
         self.accounts: List[Account] = []
 
+    @property
+    def amount_processed(self) -> int:
+        return self.amount_success + self.amount_duplicate + self.amount_failed
+
+    def add(self, result: ParseResult) -> None:
+        if result == ParseResult.SUCCESS:
+            self.amount_success += 1
+        elif result == ParseResult.DUPLICATE:
+            self.amount_duplicate += 1
+        elif result == ParseResult.ERROR:
+            self.amount_failed += 1
+
+    def move_to_duplicates(self, amount: int) -> None:
+        """For successes that the database reported as existing when they were stored"""
+        self.amount_success -= amount
+        self.amount_duplicate += amount
+
+
+class SequenceRange(NamedTuple):
+    """Inclusive range of `Volgnr` sequences of an own account"""
+
+    low: int
+    high: int
+
+    def includes(self, sequence: int) -> bool:
+        return self.low <= sequence <= self.high
+
+    def extend(self, sequence: int) -> "SequenceRange":
+        return SequenceRange(min(self.low, sequence), max(self.high, sequence))
+
+    def merge(self, other: "SequenceRange") -> "SequenceRange":
+        """Two ranges only become one when nothing lies between them.
+        Otherwise the most recent one is kept, which is what incremental imports overlap with."""
+        if other.low <= self.high + 1 and self.low <= other.high + 1:
+            return SequenceRange(min(self.low, other.low), max(self.high, other.high))
+        return max(self, other, key=lambda r: r.high)
+
 
 class StorageHandler(Protocol):
     def does_transaction_already_exist(self, transaction_code: str) -> bool:
@@ -48,44 +113,84 @@ class StorageHandler(Protocol):
     def create_transaction(self, **kwargs: Any) -> Transaction:
         ...
 
+    def atomic(self) -> ContextManager[Any]:
+        ...
+
+    def preload(self, codes: Set[str], account_numbers: Set[str], names: Set[str]) -> None:
+        ...
+
+    def flush(self) -> int:
+        """Writes what is pending.
+
+        Returns:
+            The amount of created transactions that turned out to exist already
+        """
+        ...
+
+    def get_sequence_ranges(self, account_numbers: Set[str]) -> Dict[str, SequenceRange]:
+        ...
+
+    def save_sequence_ranges(self, ranges: Dict[str, SequenceRange]) -> None:
+        ...
+
 
 class AnonymousStorageHandler:
+    """Keeps everything in memory, indexed by the keys the parser looks things up with"""
+
     def __init__(self) -> None:
         self.account = Account
         self.transaction = Transaction
         self.accounts: List[Account] = []
         self.transactions: List[Transaction] = []
+        self.transactions_by_code: Dict[str, Transaction] = {}
+        self.accounts_by_number: Dict[str, Account] = {}
+        self.accounts_by_name: Dict[str, Account] = {}
 
     def does_transaction_already_exist(self, transaction_code: str) -> bool:
-        return len([t for t in self.transactions if t.code == transaction_code]) != 0
+        return transaction_code in self.transactions_by_code
 
     def get_receiver_by(self, account_number: str) -> Optional[Account]:
-        receiver = [a for a in self.accounts if a.account_number == account_number]
-        return receiver[0] if len(receiver) != 0 else None
+        return self.accounts_by_number.get(account_number_key_of(account_number))
 
     def get_other_party_by(self, account_number: str, name: str) -> Optional[Account]:
-        if account_number == "":
-            other_party = [a for a in self.accounts if a.name == name]
+        account_number_key = account_number_key_of(account_number)
+        if account_number_key == "":
+            return self.accounts_by_name.get(name_key_of(name))
         else:
-            other_party = [
-                a for a in self.accounts if a.account_number == account_number
-            ]
-
-        return other_party[0] if len(other_party) != 0 else None
+            return self.accounts_by_number.get(account_number_key)
 
     def update_receiver(self, receiver: Account) -> Account:
         receiver.is_user_owner = True
         return receiver
 
     def create_account(self, account: Account) -> Account:
+        account.set_keys()
         self.accounts.append(account)
+        self.accounts_by_number.setdefault(account.account_number_key, account)
+        self.accounts_by_name.setdefault(account.name_key, account)
         return account
 
     def create_transaction(self, **kwargs: dict[str, Any]) -> Transaction:
         transaction = self.transaction(**kwargs)
         self.transactions.append(transaction)
+        self.transactions_by_code.setdefault(transaction.code, transaction)
         return transaction
 
+    def atomic(self) -> ContextManager[Any]:
+        return nullcontext()
+
+    def preload(self, codes: Set[str], account_numbers: Set[str], names: Set[str]) -> None:
+        pass
+
+    def flush(self) -> int:
+        return 0
+
+    def get_sequence_ranges(self, account_numbers: Set[str]) -> Dict[str, SequenceRange]:
+        return {}
+
+    def save_sequence_ranges(self, ranges: Dict[str, SequenceRange]) -> None:
+        pass
+
 
 class ModelStorageHandler:
     def __init__(self, user: UserType) -> None:
@@ -101,14 +206,17 @@ class ModelStorageHandler:
 
     def get_receiver_by(self, account_number: str) -> Optional[Account]:
         return Account.objects.filter(
-            account_number=account_number, user=self.user
+            user=self.user, account_number_key=account_number_key_of(account_number)
         ).first()
 
     def get_other_party_by(self, account_number: str, name: str) -> Optional[Account]:
-        if account_number == "":
-            return Account.objects.filter(name=name).first()
+        account_number_key = account_number_key_of(account_number)
+        if account_number_key == "":
+            return Account.objects.filter(user=self.user, name_key=name_key_of(name)).first()
         else:
-            return Account.objects.filter(account_number=account_number).first()
+            return Account.objects.filter(
+                user=self.user, account_number_key=account_number_key
+            ).first()
 
     def update_receiver(self, receiver: Account) -> Account:
         if not receiver.is_user_owner:
@@ -123,84 +231,398 @@ class ModelStorageHandler:
 
     def create_transaction(self, **kwargs: dict[str, Any]) -> Transaction:
         transaction = self.transaction(**kwargs, user=self.user)
+        self.matcher.categorize([transaction])
         transaction.save()
         return transaction
 
+    @cached_property
+    def matcher(self) -> CategoryMatcher:
+        return CategoryMatcher.for_user(self.user)
+
+    def atomic(self) -> ContextManager[Any]:
+        return nullcontext()
+
+    def preload(self, codes: Set[str], account_numbers: Set[str], names: Set[str]) -> None:
+        pass
+
+    def flush(self) -> int:
+        return 0
+
+    def get_sequence_ranges(self, account_numbers: Set[str]) -> Dict[str, SequenceRange]:
+        return {}
+
+    def save_sequence_ranges(self, ranges: Dict[str, SequenceRange]) -> None:
+        pass
+
+
+class BulkModelStorageHandler:
+    """Stores transactions with set-based queries instead of a few queries per row.
+
+    The parser announces the codes, account numbers and names of a batch through `preload`,
+    after which every lookup is answered from memory. New accounts and transactions are
+    written with `bulk_create` on `flush`. Lookups mirror the ones of `ModelStorageHandler`.
+
+    By default the whole file is one transaction. With `commit_per_batch` every flush commits
+    on its own, so progress is visible to other connections while a large file is imported.
+    With `use_copy` transactions are written through a `COPY` staging table on Postgres.
+    """
+
+    def __init__(
+        self,
+        user: UserType,
+        batch_size: int = 1000,
+        commit_per_batch: bool = False,
+        use_copy: bool = False,
+    ) -> None:
+        self.user = user
+        self.batch_size = batch_size
+        self.commit_per_batch = commit_per_batch
+        self.use_copy = use_copy
+        self.pending_codes: Set[str] = set()
+        # The codes of the batch that were imported before
+        self.stored_codes: Set[str] = set()
+        # Accounts of the user by their lookup keys
+        self.accounts_by_number: Dict[str, Account] = {}
+        self.accounts_by_name: Dict[str, Account] = {}
+        self.pending_accounts: List[Account] = []
+        self.pending_transactions: List[Transaction] = []
+        self.pending_owner_ids: Set[int] = set()
+        # The counterparties of the inserted transactions, whose recurrences have changed
+        self.other_party_ids: Set[int] = set()
+        self.loaded_numbers: Set[str] = set()
+        self.loaded_names: Set[str] = set()
+
+    def atomic(self) -> ContextManager[Any]:
+        return nullcontext() if self.commit_per_batch else db_transaction.atomic()
+
+    def preload(self, codes: Set[str], account_numbers: Set[str], names: Set[str]) -> None:
+        self.stored_codes = set(
+            Transaction.objects.filter(user=self.user, code__in=codes).values_list(
+                "code", flat=True
+            )
+        )
+        numbers = {account_number_key_of(n) for n in account_numbers} - self.loaded_numbers
+        names = {name_key_of(name) for name in names} - self.loaded_names
+        if not numbers and not names:
+            return
+
+        accounts = Account.objects.filter(
+            Q(account_number_key__in=numbers) | Q(name_key__in=names), user=self.user
+        ).order_by("pk")
+        for account in accounts:
+            self.__index_account(
+                account,
+                by_number=account.account_number_key in numbers,
+                by_name=account.name_key in names,
+            )
+
+        self.loaded_numbers.update(numbers)
+        self.loaded_names.update(names)
+
+    def does_transaction_already_exist(self, transaction_code: str) -> bool:
+        """The codes of this batch and the stored ones among them. Those an import stores
+        meanwhile are skipped by the database on `flush`."""
+        return transaction_code in self.pending_codes or transaction_code in self.stored_codes
+
+    def get_receiver_by(self, account_number: str) -> Optional[Account]:
+        return self.accounts_by_number.get(account_number_key_of(account_number))
+
+    def get_other_party_by(self, account_number: str, name: str) -> Optional[Account]:
+        account_number_key = account_number_key_of(account_number)
+        if account_number_key == "":
+            return self.accounts_by_name.get(name_key_of(name))
+        else:
+            return self.accounts_by_number.get(account_number_key)
+
+    def update_receiver(self, receiver: Account) -> Account:
+        if not receiver.is_user_owner:
+            receiver.is_user_owner = True
+            if receiver.pk is not None:
+                self.pending_owner_ids.add(receiver.pk)
+        return receiver
+
+    def create_account(self, account: Account) -> Account:
+        account.user = self.user
+        account.set_keys()
+        self.pending_accounts.append(account)
+        self.__index_account(account, by_number=True, by_name=True)
+        return account
+
+    def create_transaction(self, **kwargs: dict[str, Any]) -> Transaction:
+        transaction = Transaction(**kwargs, user=self.user)
+        self.pending_transactions.append(transaction)
+        self.pending_codes.add(transaction.code)
+        return transaction
+
+    def flush(self) -> int:
+        inserted: List[Transaction] = []
+        with db_transaction.atomic() if self.commit_per_batch else nullcontext():
+            if self.pending_accounts:
+                self.__bulk_create_accounts(self.pending_accounts)
+            if self.pending_owner_ids:
+                Account.objects.filter(pk__in=self.pending_owner_ids).update(is_user_owner=True)
+            if self.pending_transactions:
+                if self.matcher:
+                    self.matcher.categorize(self.pending_transactions)
+                insert_new = (
+                    Transaction.objects.copy_new if self.use_copy else Transaction.objects.insert_new
+                )
+                inserted = insert_new(self.pending_transactions, batch_size=self.batch_size)
+                # Inserted in bulk, so without the signals that keep the totals up to date
+                MonthlyTotal.objects.add(inserted, batch_size=self.batch_size)
+                self.other_party_ids.update(
+                    transaction.other_party.pk for transaction in inserted
+                )
+            if self.pending_accounts or self.pending_owner_ids or inserted:
+                bump_data_version(self.user.pk)
+
+        skipped = len(self.pending_transactions) - len(inserted)
+        self.pending_accounts = []
+        self.pending_transactions = []
+        self.pending_codes = set()
+        self.stored_codes = set()
+        self.pending_owner_ids = set()
+        return skipped
+
+    @cached_property
+    def matcher(self) -> CategoryMatcher:
+        """The rules of the user, compiled once per import"""
+        return CategoryMatcher.for_user(self.user)
+
+    def get_sequence_ranges(self, account_numbers: Set[str]) -> Dict[str, SequenceRange]:
+        marks = SequenceWatermark.objects.filter(user=self.user, account_number__in=account_numbers)
+        if not self.commit_per_batch:
+            # Concurrent imports of the same accounts wait until this one is committed
+            marks = marks.select_for_update()
+        return {mark.account_number: SequenceRange(mark.low, mark.high) for mark in marks}
+
+    def save_sequence_ranges(self, ranges: Dict[str, SequenceRange]) -> None:
+        with db_transaction.atomic() if self.commit_per_batch else nullcontext():
+            for account_number, sequences in sorted(ranges.items()):
+                mark, created = SequenceWatermark.objects.select_for_update().get_or_create(
+                    user=self.user,
+                    account_number=account_number,
+                    defaults={"low": sequences.low, "high": sequences.high},
+                )
+                merged = SequenceRange(mark.low, mark.high).merge(sequences)
+                if not created and merged != (mark.low, mark.high):
+                    mark.low, mark.high = merged
+                    mark.save(update_fields=["low", "high"])
+
+    def __index_account(self, account: Account, by_number: bool, by_name: bool) -> None:
+        if by_number:
+            self.accounts_by_number.setdefault(account.account_number_key, account)
+        if by_name:
+            self.accounts_by_name.setdefault(account.name_key, account)
+
+    def __bulk_create_accounts(self, accounts: List[Account]) -> None:
+        """Another import of the user may have created some of the accounts since they were
+        preloaded. Those are skipped with `ON CONFLICT DO NOTHING` and used instead."""
+        Account.objects.bulk_create(accounts, batch_size=self.batch_size, ignore_conflicts=True)
+
+        # No primary keys are returned when conflicts are ignored, so they are selected by the
+        # keys of the unique constraints: the account number, or the name when there is none.
+        missing = {unique_key_of(a.account_number_key, a.name_key): a for a in accounts}
+        ids = Account.objects.filter(
+            Q(account_number_key__in={a.account_number_key for a in missing.values()})
+            | Q(account_number_key="", name_key__in={a.name_key for a in missing.values()}),
+            user=self.user,
+        ).values_list("account_number_key", "name_key", "pk")
+        for account_number_key, name_key, pk in ids:
+            account = missing.get(unique_key_of(account_number_key, name_key))
+            if account is not None:
+                account.pk = pk
+                account._state.adding = False
+        # An own account the other import created as a counterparty
+        self.pending_owner_ids.update(a.pk for a in accounts if a.is_user_owner)
+
+
+def unique_key_of(account_number_key: str, name_key: str) -> Tuple[str, str]:
+    """The key the unique constraints of `Account` put on the accounts of a user"""
+    return account_number_key, "" if account_number_key else name_key
+
 
 class FileParser:
-    def __init__(self, storage_handler: StorageHandler) -> None:
+    def __init__(self, storage_handler: StorageHandler, batch_size: int = 1000) -> None:
         self.storage = storage_handler
+        self.batch_size = batch_size
+
+    def parse(
+        self,
+        file: Iterable[str],
+        on_batch: Optional[Callable[[CreationReport], None]] = None,
+    ) -> CreationReport:
+        return self.parse_rows(read_raw_transaction_data_from(file), on_batch)
+
+    def parse_rows(
+        self,
+        rows: Iterable[RawTransaction],
+        on_batch: Optional[Callable[[CreationReport], None]] = None,
+    ) -> CreationReport:
+        report = CreationReport()
+        for report in self.stream_rows(rows):
+            if on_batch is not None:
+                on_batch(report)
 
-    def parse(self, file: TextIO) -> CreationReport:
-        results = [
-            self.__create_transaction_from(transaction_map)
-            for transaction_map in read_raw_transaction_data_from(file)
-        ]
+        return report
 
-        return self.__create_result_report_from(results)
+    def stream(self, file: Iterable[str]) -> Iterator[CreationReport]:
+        return self.stream_rows(read_raw_transaction_data_from(file))
 
-    def __create_transaction_from(self, transaction_map: Dict[str, str]) -> ParseResult:
-        transaction_code = self.__map_raw_data_to_transaction_code(transaction_map)
+    def stream_rows(self, rows: Iterable[RawTransaction]) -> Iterator[CreationReport]:
+        """Parses the rows batch by batch and yields the running report after every flush.
+        Nothing of a flushed batch is held on to, unless the storage handler keeps it."""
+        report = CreationReport()
+        imported: Dict[str, Optional[SequenceRange]] = {}
+        seen: Dict[str, SequenceRange] = {}
+        failed: Set[str] = set()
+
+        with self.storage.atomic():
+            for batch in chunked(rows, self.batch_size):
+                batch = self.__discard_imported_rows(batch, imported, seen, report)
+                self.__preload(batch)
+                for row in batch:
+                    result = self.__create_transaction_from(row)
+                    if result == ParseResult.ERROR:
+                        failed.add(account_number_key_of(row.account_number))
+                    report.add(result)
+                report.move_to_duplicates(self.storage.flush())
+
+                self.__attach_stored_objects_to(report)
+                yield report
+
+            # An export holds every sequence of an account between its first and last row.
+            # Rows that failed are not imported, so their account keeps its earlier range.
+            self.storage.save_sequence_ranges(
+                {key: sequences for key, sequences in seen.items() if key not in failed}
+            )
+
+        self.__attach_stored_objects_to(report)
+
+    def __discard_imported_rows(
+        self,
+        batch: List[RawTransaction],
+        imported: Dict[str, Optional[SequenceRange]],
+        seen: Dict[str, SequenceRange],
+        report: CreationReport,
+    ) -> List[RawTransaction]:
+        """Rows within the imported sequences of their account are duplicates for sure.
+        The sequences are kept by account number key, like the accounts are looked up."""
+        keys = [account_number_key_of(row.account_number) for row in batch]
+        new_keys = set(keys) - imported.keys()
+        if new_keys:
+            ranges = self.storage.get_sequence_ranges(new_keys)
+            imported.update({key: ranges.get(key) for key in new_keys})
+
+        rows = []
+        for row, key in zip(batch, keys):
+            if not row.sequence.isdigit():
+                rows.append(row)
+                continue
+
+            sequence = int(row.sequence)
+            sequences = seen.get(key)
+            seen[key] = (
+                sequences.extend(sequence) if sequences else SequenceRange(sequence, sequence)
+            )
+
+            imported_sequences = imported[key]
+            if imported_sequences is not None and imported_sequences.includes(sequence):
+                report.add(ParseResult.DUPLICATE)
+            else:
+                rows.append(row)
+        return rows
+
+    def __preload(self, batch: List[RawTransaction]) -> None:
+        """Stored rows are known before their accounts are looked up, so they neither create
+        nor update accounts"""
+        codes = set()
+        account_numbers = set()
+        names = set()
+        for row in batch:
+            codes.add(self.__map_raw_data_to_transaction_code(row))
+            account_numbers.add(row.account_number)
+            if row.other_party_account_number == "":
+                names.add(row.other_party_name)
+            else:
+                account_numbers.add(row.other_party_account_number)
+
+        self.storage.preload(codes, account_numbers, names)
+
+    def __create_transaction_from(self, row: RawTransaction) -> ParseResult:
+        transaction_code = self.__map_raw_data_to_transaction_code(row)
 
         if self.storage.does_transaction_already_exist(transaction_code):
             return ParseResult.DUPLICATE
 
-        receiver = self.__get_or_create_receiver(transaction_map)
-        other_party = self.__get_or_create_other_party(transaction_map)
-        self.__create_transaction(transaction_map, receiver, other_party)
+        # A row with a date or amount that can't be read creates no accounts either
+        try:
+            transaction_date = date.fromisoformat(row.date)
+            amount = Decimal(row.amount.replace(",", "."))
+        except (ValueError, InvalidOperation):
+            return ParseResult.ERROR
+
+        receiver = self.__get_or_create_receiver(row)
+        other_party = self.__get_or_create_other_party(row)
+        self.__create_transaction(
+            row, transaction_code, transaction_date, amount, receiver, other_party
+        )
         return ParseResult.SUCCESS
 
-    def __map_raw_data_to_transaction_code(self, raw_map: Dict[str, str]) -> str:
-        return raw_map["IBAN/BBAN"] + raw_map["Volgnr"]
+    def __map_raw_data_to_transaction_code(self, row: RawTransaction) -> str:
+        return row.account_number + row.sequence
 
-    def __get_or_create_receiver(self, raw_map: Dict[str, str]) -> Account:
-        new_account = Account(
-            name="Own account", account_number=raw_map["IBAN/BBAN"], is_user_owner=True
-        )
-        receiver = self.storage.get_receiver_by(new_account.account_number)
-        return (
-            self.storage.update_receiver(receiver)
-            if receiver
-            else self.storage.create_account(new_account)
-        )
+    def __get_or_create_receiver(self, row: RawTransaction) -> Account:
+        receiver = self.storage.get_receiver_by(row.account_number)
+        if receiver:
+            return self.storage.update_receiver(receiver)
 
-    def __get_or_create_other_party(self, raw_map: Dict[str, str]) -> Account:
-        new_other_party = Account(
-            name=raw_map["Naam tegenpartij"],
-            account_number=raw_map["Tegenrekening IBAN/BBAN"],
-            is_user_owner=False,
+        return self.storage.create_account(
+            Account(name="Own account", account_number=row.account_number, is_user_owner=True)
         )
+
+    def __get_or_create_other_party(self, row: RawTransaction) -> Account:
         other_party = self.storage.get_other_party_by(
-            new_other_party.account_number, new_other_party.name
+            row.other_party_account_number, row.other_party_name
         )
-        return (
-            other_party if other_party else self.storage.create_account(new_other_party)
+        if other_party:
+            return other_party
+
+        return self.storage.create_account(
+            Account(
+                name=row.other_party_name,
+                account_number=row.other_party_account_number,
+                is_user_owner=False,
+            )
         )
 
     def __create_transaction(
-        self, raw_map: Dict[str, str], receiver: Account, other_party: Account
+        self,
+        row: RawTransaction,
+        code: str,
+        transaction_date: date,
+        amount: Decimal,
+        receiver: Account,
+        other_party: Account,
     ) -> Transaction:
         transaction = self.storage.create_transaction(
-            date=date.fromisoformat(raw_map["Datum"]),
-            code=self.__map_raw_data_to_transaction_code(raw_map),
-            currency=raw_map["Munt"],
-            memo=f'{raw_map["Omschrijving-1"]}{raw_map["Omschrijving-2"]}{raw_map["Omschrijving-3"]}',
-            amount=Decimal(raw_map["Bedrag"].replace(",", ".")),
+            date=transaction_date,
+            code=code,
+            currency=row.currency,
+            memo=f"{row.description_1}{row.description_2}{row.description_3}",
+            amount=amount,
             receiver=receiver,
             other_party=other_party,
         )
         return transaction
 
-    def __create_result_report_from(self, results: List[ParseResult]) -> CreationReport:
-        report = CreationReport()
-
-        for parse_result in results:
-            if parse_result == ParseResult.SUCCESS:
-                report.amount_success += 1
-            elif parse_result == ParseResult.DUPLICATE:
-                report.amount_duplicate += 1
-
+    def __attach_stored_objects_to(self, report: CreationReport) -> None:
         report.transactions = getattr(self.storage, "transactions", [])
         report.accounts = getattr(self.storage, "accounts", [])
 
-        return report
+
+def chunked(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Splits any iterable into lists of at most `size` items without reading it all"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
@@ -0,0 +1,217 @@
+import shutil
+import zipfile
+from datetime import timedelta
+from io import TextIOWrapper
+from tempfile import SpooledTemporaryFile
+from typing import TYPE_CHECKING, List, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from apps.transactions.models import ImportJob
+
+from .file import fingerprint_of, read_archive_rows_from
+from .fileparser import BulkModelStorageHandler, CreationReport, FileParser
+from .recurrences import refresh_recurrences
+
+if TYPE_CHECKING:
+    from apps.accounts.models import User as UserType
+else:
+    UserType = get_user_model()
+
+
+def create_import_job(user: UserType, files: List[UploadedFile]) -> ImportJob:
+    """Spools the file(s) for the worker, unless the user imported the exact same file before.
+    Then the job is done right away, with the numbers of the earlier import.
+    Several files, or a ZIP archive, are imported together as one ZIP archive."""
+    file = files[0] if len(files) == 1 and not zipfile.is_zipfile(files[0]) else bundle(files)
+    fingerprint, row_count = fingerprint_of(file.chunks())
+    if zipfile.is_zipfile(file):
+        row_count = count_rows_in_archive(file)
+    earlier_job = (
+        ImportJob.objects.filter(
+            user=user, fingerprint=fingerprint, status=ImportJob.Status.DONE
+        )
+        .order_by("pk")
+        .first()
+    )
+
+    if earlier_job is None:
+        file.seek(0)
+        return ImportJob.objects.create(
+            user=user, file=file, fingerprint=fingerprint, row_count=row_count
+        )
+
+    now = timezone.now()
+    return ImportJob.objects.create(
+        user=user,
+        fingerprint=fingerprint,
+        row_count=row_count,
+        identical_to=earlier_job,
+        status=ImportJob.Status.DONE,
+        amount_processed=earlier_job.amount_processed,
+        amount_success=earlier_job.amount_success,
+        amount_duplicate=earlier_job.amount_duplicate,
+        amount_failed=earlier_job.amount_failed,
+        started_at=now,
+        finished_at=now,
+    )
+
+
+def claim_next_job() -> Optional[ImportJob]:
+    """Marks the oldest pending job as running.
+    The conditional update makes sure two workers never get the same job"""
+    for job in ImportJob.objects.filter(status=ImportJob.Status.PENDING).order_by("pk")[:10]:
+        now = timezone.now()
+        claimed = ImportJob.objects.filter(pk=job.pk, status=ImportJob.Status.PENDING).update(
+            status=ImportJob.Status.RUNNING, started_at=now, heartbeat_at=now
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_import_job(job: ImportJob) -> ImportJob:
+    """Imports the spooled file of a claimed job, saving the counts after every batch"""
+    storage = BulkModelStorageHandler(
+        job.user,
+        batch_size=settings.IMPORT_BATCH_SIZE,
+        commit_per_batch=True,
+        use_copy=settings.IMPORT_USE_COPY,
+    )
+
+    def save_progress(report: CreationReport) -> None:
+        update_counts_of(job, report)
+        job.heartbeat_at = timezone.now()
+        job.save(
+            update_fields=[
+                "amount_processed",
+                "amount_success",
+                "amount_duplicate",
+                "amount_failed",
+                "heartbeat_at",
+            ]
+        )
+
+    parser = FileParser(storage, batch_size=settings.IMPORT_BATCH_SIZE)
+    try:
+        with job.file.open("rb") as spooled_file:
+            if zipfile.is_zipfile(spooled_file):
+                report = parser.parse_rows(
+                    read_archive_rows_from(spooled_file), on_batch=save_progress
+                )
+            else:
+                spooled_file.seek(0)
+                file = TextIOWrapper(spooled_file, encoding="latin1")
+                report = parser.parse(file, on_batch=save_progress)
+        update_counts_of(job, report)
+        if storage.other_party_ids:
+            refresh_recurrences(job.user, storage.other_party_ids)
+        job.status = ImportJob.Status.DONE
+    except Exception as error:  # pylint: disable=broad-except
+        job.status = ImportJob.Status.FAILED
+        job.error = str(error)
+
+    job.finished_at = timezone.now()
+    job.save()
+    job.file.delete(save=False)
+    return job
+
+
+def run_pending_jobs() -> List[ImportJob]:
+    """Runs jobs until none are pending anymore"""
+    jobs = []
+    while (job := claim_next_job()) is not None:
+        jobs.append(run_import_job(job))
+    return jobs
+
+
+def requeue_stale_jobs(stale_after: Optional[timedelta] = None) -> int:
+    """Jobs a worker was running when it died would stay running forever. A job is stale when
+    its worker did not finish a batch for `stale_after` (`IMPORT_STALE_AFTER` seconds), jobs
+    of workers that are still running are left alone."""
+    if stale_after is None:
+        stale_after = timedelta(seconds=settings.IMPORT_STALE_AFTER)
+    return ImportJob.objects.filter(
+        status=ImportJob.Status.RUNNING, heartbeat_at__lt=timezone.now() - stale_after
+    ).update(
+        status=ImportJob.Status.PENDING, started_at=None, heartbeat_at=None, amount_processed=0
+    )
+
+
+def update_counts_of(job: ImportJob, report: CreationReport) -> None:
+    job.amount_processed = report.amount_processed
+    job.amount_success = report.amount_success
+    job.amount_duplicate = report.amount_duplicate
+    job.amount_failed = report.amount_failed
+
+
+class ArchiveTooLargeError(ValueError):
+    pass
+
+
+def bundle(files: List[UploadedFile]) -> File:
+    """One ZIP archive with every CSV of the uploaded files, including those in uploaded
+    archives. Timestamps are left out, so the same files give the same fingerprint.
+    The amount of CSV files and their uncompressed sizes are capped, an archive of a few
+    kilobytes could otherwise unpack to gigabytes."""
+    members = 0
+
+    def check(name: str, size: int) -> None:
+        nonlocal members
+        members += 1
+        if members > settings.IMPORT_MAX_FILES:
+            raise ArchiveTooLargeError(
+                f"Upload at most {settings.IMPORT_MAX_FILES} CSV files at once"
+            )
+        if size > settings.IMPORT_MAX_FILE_SIZE:
+            raise ArchiveTooLargeError(
+                f"{name} is larger than {filesizeformat(settings.IMPORT_MAX_FILE_SIZE)}"
+            )
+
+    spooled = SpooledTemporaryFile(max_size=10 * 1024 * 1024)
+    with zipfile.ZipFile(spooled, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i, file in enumerate(files):
+            if not zipfile.is_zipfile(file):
+                check(file.name, file.size)
+                file.seek(0)
+                with archive.open(zip_info_for(f"{i:03}-{file.name}"), "w") as member:
+                    shutil.copyfileobj(file, member)
+                continue
+
+            with zipfile.ZipFile(file) as uploaded_archive:
+                for info in sorted(uploaded_archive.infolist(), key=lambda info: info.filename):
+                    name = info.filename
+                    if not name.lower().endswith(".csv"):
+                        continue
+                    # Reading a member stops at its size, so a wrong size can not unpack more
+                    check(name, info.file_size)
+                    with uploaded_archive.open(info) as source, archive.open(
+                        zip_info_for(f"{i:03}-{name}"), "w"
+                    ) as member:
+                        shutil.copyfileobj(source, member)
+
+    spooled.seek(0)
+    return File(spooled, name="transactions.zip")
+
+
+def zip_info_for(name: str) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def count_rows_in_archive(file: File) -> int:
+    rows = 0
+    file.seek(0)
+    with zipfile.ZipFile(file) as archive:
+        for name in archive.namelist():
+            if name.lower().endswith(".csv"):
+                with archive.open(name) as member:
+                    rows += max(sum(1 for _ in member) - 1, 0)
+    return rows
@@ -0,0 +1,94 @@
+import base64
+import binascii
+from datetime import date
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from django.db.models import Q
+from django.db.models.query import QuerySet
+from django.http import Http404
+
+NEXT = "n"
+PREVIOUS = "p"
+
+
+class CursorPage(NamedTuple):
+    object_list: List[Any]
+    next_cursor: Optional[str]
+    previous_cursor: Optional[str]
+    count: Optional[int] = None
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """Pages through transactions newest first, ordered by (date, id).
+    A cursor holds the key of the row a page starts after, so a page is found with a seek on
+    the index instead of skipping all earlier rows with OFFSET. Counting all rows is optional,
+    it is the one query that still gets slower with more rows."""
+
+    def __init__(self, queryset: QuerySet[Any], per_page: int, count: bool = False) -> None:
+        self.queryset = queryset
+        self.per_page = per_page
+        self.count = count
+
+    def page(self, cursor: Optional[str] = None) -> CursorPage:
+        direction, key = decode_cursor(cursor) if cursor else (NEXT, None)
+
+        if direction == NEXT:
+            rows = self.__fetch(key, after=True)
+            has_next = len(rows) > self.per_page
+            has_previous = key is not None
+            rows = rows[: self.per_page]
+        else:
+            rows = self.__fetch(key, after=False)
+            has_previous = len(rows) > self.per_page
+            # Without a key this is the last page, with the oldest rows
+            has_next = key is not None
+            rows = rows[: self.per_page][::-1]
+
+        return CursorPage(
+            object_list=rows,
+            next_cursor=encode_cursor(NEXT, rows[-1]) if has_next and rows else None,
+            previous_cursor=encode_cursor(PREVIOUS, rows[0]) if has_previous and rows else None,
+            count=self.queryset.count() if self.count else None,
+        )
+
+    def last_cursor(self) -> str:
+        return encode_cursor(PREVIOUS, None)
+
+    def __fetch(self, key: Optional[Tuple[date, int]], after: bool) -> List[Any]:
+        """The rows after (older than) or before (newer than) the key, nearest first"""
+        queryset = self.queryset
+        if key is not None:
+            day, pk = key
+            if after:
+                queryset = queryset.filter(Q(date__lt=day) | Q(date=day, pk__lt=pk))
+            else:
+                queryset = queryset.filter(Q(date__gt=day) | Q(date=day, pk__gt=pk))
+
+        ordering = ("-date", "-pk") if after else ("date", "pk")
+        return list(queryset.order_by(*ordering)[: self.per_page + 1])
+
+
+def encode_cursor(direction: str, row: Any) -> str:
+    value = direction if row is None else f"{direction}{row.date.isoformat()}.{row.pk}"
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Optional[Tuple[date, int]]]:
+    try:
+        value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        direction, key = value[0], value[1:]
+        if direction not in (NEXT, PREVIOUS):
+            raise ValueError(direction)
+        if not key:
+            return direction, None
+
+        day, pk = key.split(".")
+        return direction, (date.fromisoformat(day), int(pk))
+    except (binascii.Error, UnicodeDecodeError, IndexError, ValueError) as error:
+        raise Http404("Invalid cursor") from error
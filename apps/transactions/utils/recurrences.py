@@ -0,0 +1,136 @@
+from datetime import date
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, Collection, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth import get_user_model
+from django.db import transaction as db_transaction
+
+from apps.transactions.models import Recurrence, Transaction
+
+if TYPE_CHECKING:
+    from apps.accounts.models import User as UserType
+else:
+    UserType = get_user_model()
+
+PERIODS = [
+    Recurrence.Period.WEEKLY,
+    Recurrence.Period.MONTHLY,
+    Recurrence.Period.QUARTERLY,
+    Recurrence.Period.YEARLY,
+]
+# The average length of the periods in days
+PERIOD_DAYS = np.array([7, 365.25 / 12, 365.25 / 4, 365.25])
+PERIOD_STEPS = {
+    Recurrence.Period.WEEKLY: relativedelta(weeks=1),
+    Recurrence.Period.MONTHLY: relativedelta(months=1),
+    Recurrence.Period.QUARTERLY: relativedelta(months=3),
+    Recurrence.Period.YEARLY: relativedelta(years=1),
+}
+
+MIN_OCCURRENCES = 3
+# How far the intervals may be off the period, relative to the period
+INTERVAL_TOLERANCE = 0.15
+# How much the amounts may differ, as coefficient of variation
+AMOUNT_TOLERANCE = 0.2
+
+
+def refresh_recurrences(
+    user: UserType, other_party_ids: Optional[Collection[int]] = None
+) -> List[Recurrence]:
+    """Detects the recurrences of the user again, only of the given counterparties if any.
+    After an import those are the counterparties of the new transactions, the others did not
+    change."""
+    transactions = Transaction.objects.filter(
+        user=user, other_party__is_user_owner=False, amount__lt=0
+    )
+    recurrences = Recurrence.objects.filter(user=user)
+    if other_party_ids is not None:
+        transactions = transactions.filter(other_party__in=other_party_ids)
+        recurrences = recurrences.filter(other_party__in=other_party_ids)
+
+    rows = list(
+        transactions.order_by("other_party", "date").values_list("other_party", "date", "amount")
+    )
+    found = [
+        Recurrence(
+            user=user,
+            other_party_id=recurrence["other_party_id"],
+            period=recurrence["period"],
+            amount=recurrence["amount"],
+            occurrences=recurrence["occurrences"],
+            first_date=recurrence["first_date"],
+            last_date=recurrence["last_date"],
+            next_date=recurrence["last_date"] + PERIOD_STEPS[recurrence["period"]],
+        )
+        for recurrence in find_recurrences(
+            np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter((row[1].toordinal() for row in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows)),
+        )
+    ]
+
+    with db_transaction.atomic():
+        recurrences.delete()
+        Recurrence.objects.bulk_create(found)
+    return found
+
+
+def find_recurrences(
+    other_party_ids: np.ndarray, days: np.ndarray, amounts: np.ndarray
+) -> Iterator[Dict[str, Any]]:
+    """The counterparties that are paid at a regular interval with a stable amount.
+
+    The rows are sorted by counterparty and day (as ordinal). All statistics are computed for
+    every counterparty at once, with `bincount` over the group index of each row; Python only
+    loops over the recurrences that are found.
+    """
+    if len(days) == 0:
+        return
+
+    starts_group = np.ones(len(days), dtype=bool)
+    starts_group[1:] = other_party_ids[1:] != other_party_ids[:-1]
+    group = np.cumsum(starts_group) - 1
+    starts = np.flatnonzero(starts_group)
+    counts = np.bincount(group)
+    groups = len(counts)
+
+    # The intervals between two payments to the same counterparty
+    same_group = ~starts_group[1:]
+    interval_group = group[1:][same_group]
+    intervals = np.diff(days)[same_group].astype(np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        interval_mean, interval_std = mean_and_std(interval_group, intervals, groups)
+        amount_mean, amount_std = mean_and_std(group, amounts, groups)
+
+        nearest = np.abs(interval_mean[:, None] - PERIOD_DAYS[None, :]).argmin(axis=1)
+        period_days = PERIOD_DAYS[nearest]
+        recurring = (
+            (counts >= MIN_OCCURRENCES)
+            & (np.abs(interval_mean - period_days) <= INTERVAL_TOLERANCE * period_days)
+            & (interval_std <= INTERVAL_TOLERANCE * period_days)
+            & (amount_std <= AMOUNT_TOLERANCE * np.abs(amount_mean))
+        )
+
+    for i in np.flatnonzero(recurring):
+        first, last = starts[i], starts[i] + counts[i] - 1
+        yield {
+            "other_party_id": int(other_party_ids[first]),
+            "period": PERIODS[nearest[i]],
+            "amount": Decimal(f"{amount_mean[i]:.2f}"),
+            "occurrences": int(counts[i]),
+            "first_date": date.fromordinal(int(days[first])),
+            "last_date": date.fromordinal(int(days[last])),
+        }
+
+
+def mean_and_std(
+    group: np.ndarray, values: np.ndarray, groups: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """The mean and standard deviation of the values of every group, NaN for empty groups"""
+    count = np.bincount(group, minlength=groups)
+    mean = np.bincount(group, weights=values, minlength=groups) / count
+    square_mean = np.bincount(group, weights=values ** 2, minlength=groups) / count
+    return mean, np.sqrt(np.maximum(square_mean - mean ** 2, 0))
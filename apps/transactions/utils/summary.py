@@ -1,5 +1,8 @@
+from datetime import date
 from decimal import Decimal
-from typing import Iterable, List
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from django.utils.functional import cached_property
 
 from apps.transactions.models import Account, Transaction
 
@@ -7,57 +10,53 @@ from .transaction_flow import create_flow_for
 
 
 class Summary:
-    """Summary of any list of given transactions"""
+    """Summary of any list of given transactions.
+    Every aggregate is computed in one pass over the transactions, the flow graph once when it
+    is first used, so templates can read them as often as they like."""
 
     def __init__(self, transactions: List[Transaction]) -> None:
         self.transactions_all = transactions
-        if not transactions:
-            return
-        self.date_first = min([t.date for t in self.transactions_all])
-        self.date_last = max([t.date for t in self.transactions_all])
-        self.receivers = self.extract_receivers()
-        self.flow_graph = create_flow_for(self.transactions_all)
-
-    def extract_receivers(self) -> Iterable[Account]:
-        """I want to have an overview of receivers as well"""
-        receivers: List[Account] = []
-        for transaction in self.transactions_all:
-            if transaction.receiver not in receivers:
-                receivers.append(transaction.receiver)
-        return receivers
+        self.date_first: Optional[date] = None
+        self.date_last: Optional[date] = None
+        # I want to have an overview of receivers as well
+        self.receivers: List[Account] = []
+        # To whom did we donate our money?
+        self.expenses_to_outside = Decimal(0)
+        # Who gave us their money?
+        self.incomes_from_outside = Decimal(0)
+
+        seen_receivers: Set[Tuple[Any, Optional[int]]] = set()
+        for transaction in transactions:
+            if self.date_first is None or transaction.date < self.date_first:
+                self.date_first = transaction.date
+            if self.date_last is None or transaction.date > self.date_last:
+                self.date_last = transaction.date
+
+            receiver_key = identity_of(transaction.receiver)
+            if receiver_key not in seen_receivers:
+                seen_receivers.add(receiver_key)
+                self.receivers.append(transaction.receiver)
+
+            if not transaction.other_party.is_user_owner:
+                if transaction.amount < 0:
+                    self.expenses_to_outside += transaction.amount
+                elif transaction.amount > 0:
+                    self.incomes_from_outside += transaction.amount
+
+        # did I do good or bad this period?
+        self.total_balance = self.incomes_from_outside + self.expenses_to_outside
 
     @property
     def amount_of_receivers(self) -> int:
         """For display purposes you need to show the amount of receivers"""
-        return sum([1 for _ in self.receivers])
+        return len(self.receivers)
 
-    @property
-    def expenses_to_outside(self) -> Decimal:
-        """To whom did we donate our money?"""
-        return Decimal(
-            sum(
-                [
-                    t.amount
-                    for t in self.transactions_all
-                    if t.amount < 0 and not t.other_party.is_user_owner
-                ]
-            )
-        )
+    @cached_property
+    def flow_graph(self) -> Dict[str, List[Dict[str, Any]]]:
+        return create_flow_for(self.transactions_all)
 
-    @property
-    def incomes_from_outside(self) -> Decimal:
-        """Who gave us their money?"""
-        return Decimal(
-            sum(
-                [
-                    t.amount
-                    for t in self.transactions_all
-                    if t.amount > 0 and not t.other_party.is_user_owner
-                ]
-            )
-        )
 
-    @property
-    def total_balance(self) -> Decimal:
-        """did I do good or bad this period?"""
-        return self.incomes_from_outside + self.expenses_to_outside
+def identity_of(account: Account) -> Tuple[Any, Optional[int]]:
+    """Accounts that are not saved (anonymous uploads) are only equal to themselves,
+    like `Model.__eq__` does"""
+    return (account.pk, None) if account.pk is not None else (None, id(account))
@@ -1,7 +1,7 @@
 from decimal import Decimal
-from typing import Any, Dict, List
+from typing import Any, Collection, Dict, List, Tuple
 
-from networkx import DiGraph, simple_cycles
+from networkx import DiGraph, strongly_connected_components
 
 from apps.transactions.models import Account, Transaction
 from apps.transactions.utils.objects import CommonEqualityMixin
@@ -19,14 +19,6 @@ class TransactionLink(CommonEqualityMixin):
         self.value = value
         self.is_target_external = is_target_external
 
-    def has_same_target(self, target: str, source: str) -> bool:
-        """we need to know if we need to flip"""
-        return self.source == source and self.target == target
-
-    def is_opposite_target(self, target: str, source: str) -> bool:
-        """we need to know if we need to flip"""
-        return self.source == target and self.target == source
-
     def update(self, value: Decimal) -> None:
         """Not only updates the moneys, but alsof flips source and target when negative moneys.
         Negative moneys is not supported in a sankey (well, I don't want it :D)"""
@@ -49,8 +41,8 @@ class TransactionFlow:
 def create_flow_for(transactions: List[Transaction]) -> Dict[str, List[Dict[str, Any]]]:
     nodes = create_nodes_from(transactions)
     links = create_links_from(transactions, nodes)
-    links_to_skip = get_links_that_cause_loops(links)
-    links = [l for l in links if l not in links_to_skip]
+    links_to_skip = {id(l) for l in get_links_that_cause_loops(links)}
+    links = [l for l in links if id(l) not in links_to_skip]
     return create_flow_graph_for(nodes, links)
 
 
@@ -93,14 +85,19 @@ def create_nodes_from(transactions: List[Transaction]) -> List[TransactionNode]:
 def create_links_from(
     transactions: List[Transaction], nodes: List[TransactionNode]
 ) -> List[TransactionLink]:
-    """The links between flow_nodes. To see where the moneys go"""
-    links: List[TransactionLink] = []
+    """The links between flow_nodes. To see where the moneys go.
+
+    There is one link per pair of nodes, whichever way the money went. Its value is summed up
+    in the direction of the first transaction between them, and the link flips whenever more
+    money went the other way."""
+    node_names = NodeNames(nodes)
+    links: Dict[Tuple[str, str], TransactionLink] = {}
     for transaction in transactions:
         if is_internal_expense(transaction):
             continue
 
-        receiver_name = find_node_name_by(transaction.receiver, nodes)
-        other_party_name = find_node_name_by(transaction.other_party, nodes)
+        receiver_name = node_names.of(transaction.receiver)
+        other_party_name = node_names.of(transaction.other_party)
         is_target_external = False
 
         if transaction.amount > 0:
@@ -112,51 +109,63 @@ def create_links_from(
             is_target_external = True
 
         value = Decimal.copy_abs(transaction.amount)
+        pair = (source, target) if source <= target else (target, source)
 
-        for link in links:
-            if link.has_same_target(target, source):
-                link.update(value)
-                break
-            elif link.is_opposite_target(target, source):
-                link.update(value * -1)
-                break
+        link = links.get(pair)
+        if link is None:
+            links[pair] = TransactionLink(source, target, value, is_target_external)
         else:
-            links.append(
-                TransactionLink(
-                    source, target, Decimal.copy_abs(transaction.amount), is_target_external
-                )
-            )
+            # Money in the opposite direction of the link, which may have flipped already
+            link.update(value if link.source == source else -value)
+
+    return list(links.values())
+
+
+class NodeNames:
+    """The node name of an account, with its account number only when another account has the
+    same name"""
 
-    return links
+    def __init__(self, nodes: List[TransactionNode]):
+        self.node_names = {node.name for node in nodes}
+        self.by_account: Dict[Tuple[str, str], str] = {}
 
+    def of(self, account: Account) -> str:
+        key = (account.name, account.account_number)
+        name = self.by_account.get(key)
+        if name is None:
+            name = self.by_account[key] = find_node_name_by(account, self.node_names)
+        return name
 
-def find_node_name_by(account: Account, nodes: List[TransactionNode]) -> str:
+
+def find_node_name_by(account: Account, node_names: Collection[str]) -> str:
     """Get either the name with account number appended or just the name of the account"""
-    return next(
-        (node.name for node in nodes if node.name == f"{account.name} ({account.account_number})"),
-        account.name,
-    )
+    name_with_number = f"{account.name} ({account.account_number})"
+    return name_with_number if name_with_number in node_names else account.name
 
 
 def get_links_that_cause_loops(links: List[TransactionLink]) -> List[TransactionLink]:
+    """The links to external accounts that are part of a loop, which a sankey can not show.
+
+    A link from one node to another is part of a loop when money also finds its way back, so
+    when both nodes are in the same strongly connected component (or it links a node to itself).
+    Finding the components takes linear time, where listing every loop could take forever."""
     dg = DiGraph()
 
     for link in links:
         dg.add_edge(link.source, link.target)
 
-    cycles_in_a_loop = simple_cycles(dg)
-
-    loop_links = []
-
-    for cycle in cycles_in_a_loop:
-        links_for_cycle = [
-            l for l in links if l.source in cycle and l.target in cycle and l.is_target_external
-        ]
-
-        for link in links_for_cycle:
-            loop_links.append(link)
-
-    return loop_links
+    component_of = {
+        node: i
+        for i, component in enumerate(strongly_connected_components(dg))
+        for node in component
+    }
+
+    return [
+        l
+        for l in links
+        if l.is_target_external
+        and (l.source == l.target or component_of[l.source] == component_of[l.target])
+    ]
 
 
 def create_flow_graph_for(
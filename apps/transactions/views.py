@@ -1,25 +1,35 @@
-from datetime import date
+from datetime import MAXYEAR, MINYEAR, date
+from decimal import Decimal
 from io import TextIOWrapper
-from typing import TYPE_CHECKING, Any, Dict
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
 
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.models.query import QuerySet
-from django.http.response import HttpResponse
-from django.shortcuts import render
-from django.views.generic import ListView
+from django.http import Http404
+from django.http.response import (
+    HttpResponse,
+    HttpResponseBase,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.functional import cached_property
+from django.views.generic import DetailView, ListView, TemplateView, View
 from django.views.generic.edit import FormView
 
-from apps.transactions.utils.fileparser import (
-    AnonymousStorageHandler,
-    FileParser,
-    ModelStorageHandler,
-)
+from apps.transactions.utils.fileparser import AnonymousStorageHandler, FileParser
+from apps.transactions.utils.importjobs import ArchiveTooLargeError, create_import_job
 
-from .forms import TransactionFileForm
-from .models import Transaction
+from .forms import ExportFilterForm, TransactionFileForm, TransactionFilesForm
+from .managers import LISTED_FIELDS
+from .models import ImportJob, Recurrence, Transaction, account_number_key_of
+from .utils.cache import get_cached_dashboard
 from .utils.date import get_start_end_date_from
+from .utils.export import export_rows, to_csv, to_ndjson
+from .utils.pagination import CursorPage, KeysetPaginator
+from .utils.summary import Summary
 
 if TYPE_CHECKING:
     from apps.accounts.models import User
@@ -31,30 +41,42 @@ class TransactionListView(LoginRequiredMixin, ListView):
     context_object_name = "transactions"
     model = Transaction
     paginate_by = 20
+    # Counting all transactions of a month is the only query that grows with the month
+    paginate_count = False
 
     def get_queryset(self) -> QuerySet[Any]:
         if not isinstance(self.request.user, User): raise RuntimeError()
-        month = self.get_date_for_transactions()
-        date_range = get_start_end_date_from(month)
-        return Transaction.objects.filter(
-            date__gte=date_range[0], date__lte=date_range[1], user=self.request.user
-        ).order_by("-date")
+        date_range = get_start_end_date_from(self.month)
+        return (
+            Transaction.objects.filter(
+                date__gte=date_range[0], date__lte=date_range[1], user=self.request.user
+            )
+            .select_related("other_party")
+            .only(*LISTED_FIELDS)
+            .order_by("-date", "-pk")
+        )
 
     def get_context_data(self, **kwargs: dict[str, Any]) -> Dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        month = self.get_date_for_transactions()
-        context["month"] = month
-        context["top_incomes"] = Transaction.statistics.top_incomes(
-            month, self.request.user
-        )
-        context["top_expenses"] = Transaction.statistics.top_expenses(
-            month, self.request.user
-        )
-        overview = Transaction.statistics.get_external_totals(month, self.request.user)
-        context["sum_incomes"] = overview["incomes"]
-        context["sum_expenses"] = overview["expenses"]
+        dashboard = get_cached_dashboard(self.month, self.request.user)
+        context["month"] = self.month
+        context["top_incomes"] = dashboard["top_incomes"]
+        context["top_expenses"] = dashboard["top_expenses"]
+        context["sum_incomes"] = dashboard["incomes"]
+        context["sum_expenses"] = dashboard["expenses"]
         return context
 
+    def paginate_queryset(
+        self, queryset: QuerySet[Any], page_size: int
+    ) -> Tuple[KeysetPaginator, CursorPage, List[Any], bool]:
+        paginator = KeysetPaginator(queryset, page_size, count=self.paginate_count)
+        page = paginator.page(self.request.GET.get("cursor"))
+        return paginator, page, page.object_list, page.has_next() or page.has_previous()
+
+    @cached_property
+    def month(self) -> date:
+        return self.get_date_for_transactions()
+
     def get_date_for_transactions(self) -> date:
         month_querystring = self.request.GET.get("month")
         month = date.today() - relativedelta(months=1)
@@ -65,17 +87,189 @@ class TransactionListView(LoginRequiredMixin, ListView):
         return month
 
 
+class YearOverviewView(LoginRequiredMixin, TemplateView):
+    """The months and counterparties of a year next to those of the year before"""
+
+    template_name = "transactions/year.html"
+    top_counterparties = 10
+
+    def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
+        if not isinstance(self.request.user, User): raise RuntimeError()
+        context = super().get_context_data(**kwargs)
+        try:
+            year = int(self.request.GET.get("year", date.today().year))
+        except ValueError as error:
+            raise Http404("Invalid year") from error
+        # The year before has to exist as well
+        if not MINYEAR < year <= MAXYEAR:
+            raise Http404("Invalid year")
+        start, end = date(year - 1, 1, 1), date(year, 12, 31)
+
+        series = Transaction.statistics.get_monthly_series(start, end, self.request.user)
+        previous, current = series[:12], series[12:]
+        context["months"] = [
+            {
+                "month": this["month"],
+                "incomes": this["incomes"],
+                "expenses": this["expenses"],
+                "previous_incomes": last["incomes"],
+                "previous_expenses": last["expenses"],
+            }
+            for this, last in zip(current, previous)
+        ]
+
+        counterparties = list(
+            Transaction.statistics.get_counterparty_totals(
+                date(year, 1, 1), end, self.request.user
+            )[: self.top_counterparties]
+        )
+        previous_totals = {
+            row["other_party"]: row
+            for row in Transaction.statistics.get_counterparty_totals(
+                start, date(year - 1, 12, 31), self.request.user
+            ).filter(other_party__in=[row["other_party"] for row in counterparties])
+        }
+        for row in counterparties:
+            row["previous_expenses"] = previous_totals.get(row["other_party"], {}).get(
+                "expenses", Decimal(0)
+            )
+
+        context["year"] = year
+        context["counterparties"] = counterparties
+        context["incomes"] = sum(month["incomes"] for month in current)
+        context["expenses"] = sum(month["expenses"] for month in current)
+        context["previous_incomes"] = sum(month["incomes"] for month in previous)
+        context["previous_expenses"] = sum(month["expenses"] for month in previous)
+        return context
+
+
+class TransactionExportView(LoginRequiredMixin, View):
+    """Streams the transactions of the user as CSV or newline-delimited JSON,
+    optionally between two dates and of one own account"""
+
+    formats = {
+        "csv": (to_csv, "text/csv"),
+        "ndjson": (to_ndjson, "application/x-ndjson"),
+    }
+
+    def get(self, request: Any, export_format: str) -> HttpResponseBase:
+        if not isinstance(self.request.user, User): raise RuntimeError()
+        form = ExportFilterForm(request.GET)
+        if export_format not in self.formats:
+            raise Http404("Unknown export format")
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors}, status=400)
+
+        transactions = Transaction.objects.filter(user=self.request.user)
+        if form.cleaned_data["start"]:
+            transactions = transactions.filter(date__gte=form.cleaned_data["start"])
+        if form.cleaned_data["end"]:
+            transactions = transactions.filter(date__lte=form.cleaned_data["end"])
+        if form.cleaned_data["account"]:
+            transactions = transactions.filter(
+                receiver__account_number_key=account_number_key_of(form.cleaned_data["account"])
+            )
+
+        serialize, content_type = self.formats[export_format]
+        response = StreamingHttpResponse(
+            serialize(export_rows(transactions)), content_type=content_type
+        )
+        response["Content-Disposition"] = f'attachment; filename="transactions.{export_format}"'
+        return response
+
+
+class TransactionSearchView(LoginRequiredMixin, ListView):
+    """Searches the memos and counterparties of all transactions of the user"""
+
+    context_object_name = "transactions"
+    template_name = "transactions/search.html"
+    paginate_by = 20
+
+    def get_queryset(self) -> QuerySet[Any]:
+        if not isinstance(self.request.user, User): raise RuntimeError()
+        if not self.query:
+            return Transaction.objects.none()
+        return Transaction.objects.search(self.request.user, self.query)
+
+    def get_context_data(self, **kwargs: dict[str, Any]) -> Dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+        context["query"] = self.query
+        return context
+
+    @cached_property
+    def query(self) -> str:
+        return self.request.GET.get("q", "").strip()
+
+
+class RecurrenceListView(LoginRequiredMixin, ListView):
+    """The subscriptions and other fixed charges found in the history of the user"""
+
+    context_object_name = "recurrences"
+    template_name = "transactions/recurrences.html"
+
+    def get_queryset(self) -> QuerySet[Any]:
+        if not isinstance(self.request.user, User): raise RuntimeError()
+        return (
+            Recurrence.objects.filter(user=self.request.user)
+            .select_related("other_party")
+            .order_by("next_date", "other_party__name")
+        )
+
+
 class UploadTransactionsFormView(LoginRequiredMixin, FormView):
+    """Spools the file for the import worker (`manage.py process_imports`)"""
+
     template_name = "transactions/upload.html"
-    success_url = "/transactions"
-    form_class = TransactionFileForm
+    form_class = TransactionFilesForm
 
-    def form_valid(self, form: TransactionFileForm) -> HttpResponse:
+    def form_valid(self, form: TransactionFilesForm) -> HttpResponse:
         if not isinstance(self.request.user, User): raise RuntimeError()
-        file = TextIOWrapper(form.files["file"].file, encoding="latin1")
-        result = FileParser(ModelStorageHandler(self.request.user)).parse(file)
+        try:
+            job = create_import_job(self.request.user, form.cleaned_data["file"])
+        except ArchiveTooLargeError as error:
+            form.add_error("file", str(error))
+            return self.form_invalid(form)
+
+        return redirect("transactions:import-job", pk=job.pk)
+
 
-        return super().form_valid(form)
+class ImportJobDetailView(LoginRequiredMixin, DetailView):
+    context_object_name = "job"
+    template_name = "transactions/import_job.html"
+
+    def get_queryset(self) -> QuerySet[Any]:
+        return ImportJob.objects.filter(user=self.request.user)
+
+
+class ImportJobStatusView(LoginRequiredMixin, View):
+    """Polled by the job page while the worker is importing"""
+
+    def get(self, request: Any, pk: int) -> JsonResponse:
+        job = get_object_or_404(
+            ImportJob.objects.only(
+                "status",
+                "amount_processed",
+                "amount_success",
+                "amount_duplicate",
+                "amount_failed",
+                "error",
+                "identical_to",
+            ),
+            pk=pk,
+            user=request.user,
+        )
+        return JsonResponse(
+            {
+                "id": job.pk,
+                "status": job.status,
+                "processed": job.amount_processed,
+                "success": job.amount_success,
+                "duplicate": job.amount_duplicate,
+                "failed": job.amount_failed,
+                "error": job.error,
+                "identical_to": job.identical_to_id,
+            }
+        )
 
 
 class UploadAnonymousTransactionsFormView(FormView):
@@ -90,5 +284,6 @@ class UploadAnonymousTransactionsFormView(FormView):
         return render(
             self.request,
             UploadAnonymousTransactionsFormView.template_name,
-            {"results": results},
+            # The graph and the text read the same summary
+            {"results": results, "summary": Summary(results.transactions)},
         )
@@ -0,0 +1 @@
+"""Micro-benchmarks, run them as modules from the project root: `python -m benchmarks.<name>`"""
@@ -0,0 +1,45 @@
+"""Rows per second of importing with batched INSERTs compared with COPY (PostgreSQL only)"""
+import sys
+import time
+from typing import Any, Dict
+
+from benchmarks.utils import Rollback, create_benchmark_user, setup_django
+
+setup_django()
+
+from django.db import connection, transaction  # noqa: E402
+
+from apps.transactions.tests.utils import generate_test_file  # noqa: E402
+from apps.transactions.utils.fileparser import BulkModelStorageHandler, FileParser  # noqa: E402
+
+
+def rows_per_second(amount: int, **options: Any) -> float:
+    try:
+        with transaction.atomic():
+            storage = BulkModelStorageHandler(create_benchmark_user(), **options)
+            start = time.perf_counter()
+            report = FileParser(storage, batch_size=options["batch_size"]).parse(
+                generate_test_file(amount, other_parties=500)
+            )
+            elapsed = time.perf_counter() - start
+            assert report.amount_success == amount
+            raise Rollback()
+    except Rollback:
+        pass
+    return amount / elapsed
+
+
+def main(amount: int = 100_000) -> None:
+    if connection.vendor != "postgresql":
+        sys.exit("COPY needs PostgreSQL, point DATABASE_URL to a PostgreSQL database")
+
+    engines: Dict[str, Dict[str, Any]] = {
+        "insert": {"batch_size": 5000, "use_copy": False},
+        "copy": {"batch_size": 5000, "use_copy": True},
+    }
+    for name, options in engines.items():
+        print(f"{name:>7}: {rows_per_second(amount, **options):>10,.0f} rows/s ({amount:,} rows)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
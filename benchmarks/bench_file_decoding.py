@@ -0,0 +1,49 @@
+"""Rows per second of the CSV decoder, compared with building a dict per row"""
+import csv
+import io
+import time
+from typing import Any, Callable, Dict, Iterator
+
+from apps.transactions.utils.file import read_raw_transaction_data_from
+
+HEADER = (
+    '"IBAN/BBAN","Munt","BIC","Volgnr","Datum","Rentedatum","Bedrag","Saldo na trn",'
+    '"Tegenrekening IBAN/BBAN","Naam tegenpartij","Naam uiteindelijke partij",'
+    '"Naam initiërende partij","BIC tegenpartij","Code","Batch ID","Transactiereferentie",'
+    '"Machtigingskenmerk","Incassant ID","Betalingskenmerk","Omschrijving-1","Omschrijving-2",'
+    '"Omschrijving-3","Reden retour","Oorspr bedrag","Oorspr munt","Koers"\n'
+)
+ROW = (
+    '"NL11RABO0104955555","EUR","RABONL2U","{i:018}","2019-09-01","2019-09-01","-2,50",'
+    '"+1868,12","NL42RABO0114164838","J.M.G. Kerkhoffs eo","","","RABONL2U","cb","","","",'
+    '"","","Spotify","1","2","","","",""\n'
+)
+
+
+def read_dict_per_row(file: Any) -> Iterator[Dict[str, str]]:
+    """The decoder before the columns were resolved from the header"""
+    reader = csv.reader(file, delimiter=",", quotechar='"')
+    header_mapping = {i: header for i, header in enumerate(next(reader))}
+    for row in reader:
+        yield {header_mapping[row_i]: value for row_i, value in enumerate(row)}
+
+
+def rows_per_second(decode: Callable[[Any], Iterator[Any]], content: str) -> float:
+    start = time.perf_counter()
+    amount = sum(1 for _ in decode(io.StringIO(content)))
+    return amount / (time.perf_counter() - start)
+
+
+def main(amount: int = 200_000) -> None:
+    content = HEADER + "".join(ROW.format(i=i) for i in range(amount))
+
+    for name, decode in [
+        ("dict per row", read_dict_per_row),
+        ("column indexed", read_raw_transaction_data_from),
+    ]:
+        best = max(rows_per_second(decode, content) for _ in range(3))
+        print(f"{name:>15}: {best:>12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
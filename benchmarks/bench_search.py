@@ -0,0 +1,71 @@
+"""Latency of the first page of search results on a large history (PostgreSQL only)"""
+import random
+import statistics
+import sys
+import time
+from typing import Any, List
+
+from benchmarks.utils import Rollback, create_benchmark_user, setup_django
+
+setup_django()
+
+from django.db import connection, transaction  # noqa: E402
+
+from apps.transactions.models import Transaction  # noqa: E402
+from apps.transactions.tests.utils import generate_test_file  # noqa: E402
+from apps.transactions.utils.fileparser import BulkModelStorageHandler, FileParser  # noqa: E402
+
+OTHER_PARTIES = 5000
+
+
+def queries_for(amount: int) -> List[str]:
+    """Rare words of the memos, and names of counterparties with a typo"""
+    rng = random.Random(42)
+    memos = [f"payment {rng.randrange(amount)}" for _ in range(100)]
+    names = [f"Prty {rng.randrange(OTHER_PARTIES)}" for _ in range(100)]
+    return memos + names
+
+
+def latencies(user: Any, queries: List[str], page_size: int = 20) -> List[float]:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        list(Transaction.objects.search(user, query)[:page_size])
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main(amount: int = 1_000_000, target_ms: float = 100.0) -> None:
+    if connection.vendor != "postgresql":
+        sys.exit("The search indexes need PostgreSQL, point DATABASE_URL to a PostgreSQL database")
+
+    try:
+        with transaction.atomic():
+            user = create_benchmark_user()
+            storage = BulkModelStorageHandler(user, batch_size=10_000, use_copy=True)
+            FileParser(storage, batch_size=10_000).parse(
+                generate_test_file(amount, other_parties=OTHER_PARTIES)
+            )
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE transactions_transaction")
+                cursor.execute("ANALYZE transactions_account")
+
+            timings = latencies(user, queries_for(amount))
+            raise Rollback()
+    except Rollback:
+        pass
+
+    p50 = statistics.median(timings)
+    p95 = statistics.quantiles(timings, n=20)[-1]
+    verdict = "ok" if p95 <= target_ms else "too slow"
+    print(f"{len(timings)} searches in {amount:,} rows: p50 {p50:.1f} ms, p95 {p95:.1f} ms")
+    print(f"p95 target {target_ms:.0f} ms: {verdict}")
+    if p95 > target_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 100.0,
+    )
@@ -0,0 +1,112 @@
+"""Time to render the summary of an anonymous upload, compared with the summary that walked the
+transactions again for every aggregate (and was built twice per page)"""
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Callable, List
+
+from benchmarks.utils import setup_django
+
+setup_django()
+
+from apps.transactions.models import Account, Transaction  # noqa: E402
+from apps.transactions.utils.summary import Summary  # noqa: E402
+
+
+class SummaryInPasses:
+    """The summary before, leaving out the flow graph that both build the same way"""
+
+    def __init__(self, transactions: List[Transaction]) -> None:
+        self.transactions_all = transactions
+        self.date_first = min([t.date for t in transactions])
+        self.date_last = max([t.date for t in transactions])
+        self.receivers: List[Account] = []
+        for transaction in transactions:
+            if transaction.receiver not in self.receivers:
+                self.receivers.append(transaction.receiver)
+
+    @property
+    def amount_of_receivers(self) -> int:
+        return sum([1 for _ in self.receivers])
+
+    @property
+    def expenses_to_outside(self) -> Decimal:
+        return Decimal(
+            sum(
+                [
+                    t.amount
+                    for t in self.transactions_all
+                    if t.amount < 0 and not t.other_party.is_user_owner
+                ]
+            )
+        )
+
+    @property
+    def incomes_from_outside(self) -> Decimal:
+        return Decimal(
+            sum(
+                [
+                    t.amount
+                    for t in self.transactions_all
+                    if t.amount > 0 and not t.other_party.is_user_owner
+                ]
+            )
+        )
+
+    @property
+    def total_balance(self) -> Decimal:
+        return self.incomes_from_outside + self.expenses_to_outside
+
+
+def generate_transactions(amount: int, receivers: int = 5, other_parties: int = 500) -> List[Any]:
+    """Unsaved transactions, like the anonymous upload keeps in memory"""
+    rng = random.Random(42)
+    own = [
+        Account(name=f"Own {i}", account_number=f"NL11RABO{i:010}", is_user_owner=True)
+        for i in range(receivers)
+    ]
+    others = [
+        Account(name=f"Party {i}", account_number=f"NL42RABO{i:010}", is_user_owner=False)
+        for i in range(other_parties)
+    ]
+    start = date(2019, 1, 1)
+    return [
+        Transaction(
+            code=str(i),
+            date=start + timedelta(days=rng.randrange(365)),
+            amount=Decimal(rng.randrange(-50000, 50000)) / 100,
+            receiver=rng.choice(own),
+            other_party=rng.choice(others + own),
+        )
+        for i in range(amount)
+    ]
+
+
+def render(summary: Any) -> None:
+    """The attributes `summary_text.html` reads"""
+    summary.date_first, summary.date_last
+    summary.incomes_from_outside, summary.expenses_to_outside
+    summary.total_balance > 0, summary.total_balance
+    summary.amount_of_receivers
+
+
+def seconds(summarize: Callable[[List[Any]], Any], transactions: List[Any], builds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(builds):
+        render(summarize(transactions))
+    return time.perf_counter() - start
+
+
+def main(amount: int = 100_000) -> None:
+    transactions = generate_transactions(amount)
+
+    before = min(seconds(SummaryInPasses, transactions, builds=2) for _ in range(3))
+    after = min(seconds(Summary, transactions, builds=1) for _ in range(3))
+    print(f"{'in passes, twice':>16}: {before * 1000:>8.1f} ms")
+    print(f"{'one pass, once':>16}: {after * 1000:>8.1f} ms ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
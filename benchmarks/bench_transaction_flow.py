@@ -0,0 +1,90 @@
+"""Time to build the links of the money flow graph, compared with scanning the list of links and
+nodes for every transaction, and to build the whole graph including the removal of loops"""
+import sys
+import time
+from decimal import Decimal
+from typing import Any, Callable, List
+
+from benchmarks.bench_summary import generate_transactions
+
+from apps.transactions.utils.transaction_flow import (
+    TransactionLink,
+    TransactionNode,
+    create_flow_for,
+    create_links_from,
+    create_nodes_from,
+    is_internal_expense,
+)
+
+SIZES = [10_000, 50_000, 100_000, 500_000]
+# Scanning the links gets too slow to wait for above this
+MAX_SCANNED = 50_000
+
+
+def create_links_by_scanning(transactions: List[Any], nodes: List[TransactionNode]) -> List[Any]:
+    """The links before they were summed up per pair of nodes in a dict"""
+    links: List[TransactionLink] = []
+    for transaction in transactions:
+        if is_internal_expense(transaction):
+            continue
+
+        receiver_name = next(
+            (
+                node.name
+                for node in nodes
+                if node.name
+                == f"{transaction.receiver.name} ({transaction.receiver.account_number})"
+            ),
+            transaction.receiver.name,
+        )
+        other_party_name = next(
+            (
+                node.name
+                for node in nodes
+                if node.name
+                == f"{transaction.other_party.name} ({transaction.other_party.account_number})"
+            ),
+            transaction.other_party.name,
+        )
+        if transaction.amount > 0:
+            source, target, is_target_external = other_party_name, receiver_name, False
+        else:
+            source, target, is_target_external = receiver_name, other_party_name, True
+
+        value = Decimal.copy_abs(transaction.amount)
+        for link in links:
+            if link.source == source and link.target == target:
+                link.update(value)
+                break
+            elif link.source == target and link.target == source:
+                link.update(value * -1)
+                break
+        else:
+            links.append(TransactionLink(source, target, value, is_target_external))
+    return links
+
+
+def seconds(build: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    build()
+    return time.perf_counter() - start
+
+
+def main(sizes: List[int]) -> None:
+    print(f"{'transactions':>12} {'scanning':>10} {'dict':>10} {'whole flow':>11}")
+    for size in sizes:
+        transactions = generate_transactions(size)
+        nodes = create_nodes_from(transactions)
+
+        scanned = (
+            f"{seconds(lambda: create_links_by_scanning(transactions, nodes)) * 1000:>7.0f} ms"
+            if size <= MAX_SCANNED
+            else f"{'-':>10}"
+        )
+        indexed = seconds(lambda: create_links_from(transactions, nodes))
+        flow = seconds(lambda: create_flow_for(transactions))
+        print(f"{size:>12,} {scanned} {indexed * 1000:>7.0f} ms {flow * 1000:>8.0f} ms")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or SIZES)
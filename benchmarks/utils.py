@@ -0,0 +1,21 @@
+import os
+from typing import Any
+
+import django
+
+
+def setup_django() -> None:
+    """Benchmarks run against the database in DATABASE_URL, inside a transaction that is
+    rolled back at the end"""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "homebudget.settings")
+    django.setup()
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_benchmark_user() -> Any:
+    from django.contrib.auth import get_user_model
+
+    return get_user_model().objects.create(username="benchmark")
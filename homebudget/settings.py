@@ -90,6 +90,13 @@ DATABASES = {
     'default': env.db()
 }
 
+# The import worker invalidates the cached dashboards, so it has to share the cache with the
+# web processes: a database, file or Redis cache, never one per process (locmemcache://).
+# The default database cache needs `python manage.py createcachetable`.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='dbcache://dashboard_cache')
+}
+
 AUTH_USER_MODEL = 'accounts.User'
 
 # Password validation
@@ -131,11 +138,30 @@ STATICFILES_DIRS = [
     BASE_DIR / "static"
 ]
 
+# Uploaded files, e.g. transaction files waiting for the import worker
+MEDIA_ROOT = env('MEDIA_ROOT', default=str(BASE_DIR / 'media'))
+
+# Let the import worker write transactions with COPY (PostgreSQL only)
+IMPORT_USE_COPY = env.bool('IMPORT_USE_COPY', default=False)
+IMPORT_BATCH_SIZE = env.int('IMPORT_BATCH_SIZE', default=1000)
+# Limits of the CSV files in one upload, also of those in an uploaded ZIP archive
+IMPORT_MAX_FILES = env.int('IMPORT_MAX_FILES', default=100)
+IMPORT_MAX_FILE_SIZE = env.int('IMPORT_MAX_FILE_SIZE', default=50 * 1024 * 1024)
+# Seconds after its last batch that `process_imports --requeue` considers a running job stale
+IMPORT_STALE_AFTER = env.int('IMPORT_STALE_AFTER', default=15 * 60)
+
+# The dashboards are versioned, so the timeout only decides when unused ones are dropped
+DASHBOARD_CACHE_TIMEOUT = env.int('DASHBOARD_CACHE_TIMEOUT', default=60 * 60 * 24)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Full-text and trigram search (apps.transactions) use the PostgreSQL lookups
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    INSTALLED_APPS += ['django.contrib.postgres']
+
 # Debug specific settings
 if DEBUG:
     INTERNAL_IPS = ['127.0.0.1', 'localhost']